@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Weirdhost 自动续期脚本基准测试 - 针对本地模拟面板运行
+
+每个规模启动一个 mock_panel.MockPanel，在独立子进程中运行 WeirdhostAuto，统计总耗时、
+各阶段 p50/p95 延迟和峰值内存（RSS），结果可保存为 JSON 并与其他提交的结果对比。
+
+用法: python benchmark.py --servers 1,10,100 --latency-ms 30 --output bench.json --compare old.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+
+from mock_panel import MockPanel
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def git_revision():
+    """当前提交的短哈希，不在 git 仓库中时返回 unknown"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_child(report_path):
+    """子进程：按环境变量运行一次 WeirdhostAuto，把统计写入 report_path"""
+    sys.path.insert(0, ROOT)
+    from main import WeirdhostAuto
+    
+    auto = WeirdhostAuto()
+    started = time.monotonic()
+    results = auto.run()
+    wall = time.monotonic() - started
+    
+    summary = auto.result_summary()
+    report = {
+        'wall': wall,
+        'results': results,
+        'renew_ok': summary['renew_ok'],
+        'start_ok': summary['start_ok'],
+        'phases': {
+            name: {'count': count, 'p50': p50, 'p95': p95, 'total': total}
+            for name, (count, p50, p95, total) in auto.tracer.phase_stats().items()
+        },
+        # Linux 下 ru_maxrss 单位为 KB；子进程取其中最大的一个（通常是浏览器进程）
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'peak_child_rss_kb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    }
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def run_case(args, server_count):
+    """启动模拟面板并在子进程中运行一次脚本，返回统计结果"""
+    panel = MockPanel(server_count, args.latency_ms, args.failure_rate, args.cf_rate, seed=args.seed)
+    base_url = panel.start()
+    workdir = tempfile.mkdtemp(prefix='weirdhost-bench-')
+    report_path = os.path.join(workdir, 'report.json')
+    
+    env = dict(os.environ)
+    for name in ('WEIRDHOST_ACCOUNTS', 'WEIRDHOST_ACCOUNTS_FILE', 'WEIRDHOST_EMAIL', 'WEIRDHOST_PASSWORD', 'GITHUB_RUN_ID'):
+        env.pop(name, None)
+    env.update({
+        'WEIRDHOST_URL': base_url,
+        'WEIRDHOST_LOGIN_URL': f"{base_url}/auth/login",
+        'WEIRDHOST_SERVER_URLS': ','.join(panel.server_urls()),
+        'REMEMBER_WEB_COOKIE': 'bench',
+        'WEIRDHOST_API_MODE': 'off' if args.mode == 'browser' else 'auto',
+        'WEIRDHOST_CONCURRENCY': str(args.concurrency),
+        'WEIRDHOST_LOAD_PROFILE': args.profile,
+        # 每个用例的缓存目录都是新的，不关闭基线采集的话 light 用例的首次导航会按 full 加载
+        'WEIRDHOST_BASELINE_SAMPLE_HOURS': '0',
+        'WEIRDHOST_SCHEDULE': 'off',
+        'WEIRDHOST_TIME_BUDGET_MINUTES': str(args.budget_minutes),
+        'WEIRDHOST_CACHE_DIR': os.path.join(workdir, 'cache'),
+        'WEIRDHOST_TRACE_DIR': os.path.join(workdir, 'trace'),
+        'HEADLESS': 'true',
+    })
+    
+    log_path = os.path.join(workdir, 'run.log')
+    try:
+        with open(log_path, 'w', encoding='utf-8') as log:
+            process = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', report_path],
+                                     cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    finally:
+        panel.stop()
+    
+    if process.returncode != 0 or not os.path.exists(report_path):
+        print(f"❌ {server_count} 个服务器的基准运行失败，日志: {log_path}")
+        return None
+    with open(report_path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    report.update({'servers': server_count, 'panel_requests': panel.stats, 'log': log_path})
+    return report
+
+
+def print_report(cases, baseline=None):
+    """输出 Markdown 汇总表；提供 baseline 时附加与其对比的耗时变化"""
+    previous = {case['servers']: case for case in (baseline or {}).get('cases', [])}
+    
+    print("| 服务器数 | 总耗时 | 对比 | 续期成功 | 启动成功 | 峰值RSS(脚本) | 峰值RSS(浏览器) |")
+    print("|----------|--------|------|----------|----------|---------------|-----------------|")
+    for case in cases:
+        old = previous.get(case['servers'])
+        delta = f"{(case['wall'] - old['wall']) / old['wall'] * 100:+.1f}%" if old and old['wall'] else "-"
+        print(f"| {case['servers']} | {case['wall']:.1f}s | {delta} | {case['renew_ok']}/{case['servers']} | "
+              f"{case['start_ok']}/{case['servers']} | {case['peak_rss_kb'] / 1024:.0f}MB | "
+              f"{case['peak_child_rss_kb'] / 1024:.0f}MB |")
+    
+    for case in cases:
+        print(f"\n### {case['servers']} 个服务器 - 阶段耗时\n")
+        print("| 阶段 | 次数 | p50 | p95 | 总耗时 |")
+        print("|------|------|-----|-----|--------|")
+        for name, phase in sorted(case['phases'].items(), key=lambda item: -item[1]['total']):
+            print(f"| {name} | {phase['count']} | {phase['p50']:.2f}s | {phase['p95']:.2f}s | {phase['total']:.1f}s |")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='针对本地模拟面板运行 WeirdhostAuto 基准测试')
+    parser.add_argument('--servers', default='1,10,100', help='逗号分隔的服务器数量，每个数量运行一次')
+    parser.add_argument('--mode', choices=('browser', 'auto'), default='browser',
+                        help='browser: 关闭面板 API 快速通道；auto: 与默认配置相同')
+    parser.add_argument('--concurrency', type=int, default=1, help='WEIRDHOST_CONCURRENCY')
+    parser.add_argument('--profile', choices=('light', 'full'), default='light', help='WEIRDHOST_LOAD_PROFILE')
+    parser.add_argument('--budget-minutes', type=float, default=600,
+                        help='WEIRDHOST_TIME_BUDGET_MINUTES，默认足够大，避免执行计划舍弃服务器')
+    parser.add_argument('--latency-ms', type=float, default=30, help='模拟面板每个请求的平均延迟（毫秒）')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='续期/电源接口返回 500 的比例')
+    parser.add_argument('--cf-rate', type=float, default=0.0, help='返回 CF 挑战的比例')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='保存结果的 JSON 文件')
+    parser.add_argument('--compare', help='与之前保存的结果 JSON 对比')
+    parser.add_argument('--child', metavar='REPORT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        run_child(args.child)
+        return 0
+    
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    
+    cases = []
+    for server_count in [int(n) for n in args.servers.split(',') if n.strip()]:
+        print(f"⏱️ 运行基准: {server_count} 个服务器 (mode={args.mode}, concurrency={args.concurrency}, "
+              f"profile={args.profile}, latency={args.latency_ms}ms)")
+        case = run_case(args, server_count)
+        if case:
+            cases.append(case)
+    
+    if not cases:
+        return 1
+    if baseline:
+        print(f"\n对比基准: {baseline.get('revision', 'unknown')} ({baseline.get('created_at', '')})")
+    print()
+    print_report(cases, baseline)
+    
+    if args.output:
+        config = {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'child')}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'revision': git_revision(),
+                'created_at': datetime.now(timezone.utc).isoformat(),
+                'config': config,
+                'cases': cases,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n📝 结果已保存到 {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
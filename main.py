@@ -7,40 +7,1573 @@ Weirdhost 续期和启动脚本 - GitHub Actions 版本
 """
 
 import os
+import re
 import sys
+import json
 import time
+import queue
+import signal
+import asyncio
+import inspect
+import threading
+import base64
+import math
+import random
+import hashlib
+import functools
+import http.client
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field, fields, asdict
+from http.cookies import SimpleCookie
+from urllib.parse import urlparse, unquote
 from datetime import datetime, timezone, timedelta
-from playwright.sync_api import sync_playwright, TimeoutError, expect
 
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:  # 未安装 cryptography 时禁用登录状态缓存
+    Fernet = None
+    InvalidToken = ValueError
 
-class WeirdhostAuto:
+# Playwright 在确定需要浏览器时才导入（见 load_playwright），无需处理时不付出导入耗时
+async_playwright = None
+expect = None
+
+
+class PlaywrightTimeoutError(Exception):
+    """占位类，load_playwright() 导入后替换为 Playwright 的 TimeoutError（不覆盖内置 TimeoutError）"""
+
+# 模块加载完成的时间，用于统计预检耗时
+MODULE_LOADED_AT = time.monotonic()
+
+
+def load_playwright():
+    """按需导入 playwright.async_api，绑定 async_playwright、expect 和 PlaywrightTimeoutError"""
+    global async_playwright, expect, PlaywrightTimeoutError
+    if async_playwright is None:
+        from playwright.async_api import async_playwright, expect
+        from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+
+class ReadinessTracker:
+    """事件驱动的就绪等待：信号出现立即返回，并统计相对旧版固定等待节省的时间"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        # 条件名 -> 统计数据
+        self.stats = {}
+    
+    async def wait(self, name, condition, deadline, legacy_delay):
+        """等待单个就绪条件
+        
+        condition(timeout_ms) 返回一个协程，信号出现时完成，超时则抛出异常。
+        deadline 为该条件的截止时间（秒），legacy_delay 为旧版固定 sleep 的秒数。
+        返回信号是否在截止时间内出现。
+        """
+        started = time.monotonic()
+        try:
+            await condition(int(deadline * 1000))
+            fired = True
+        except Exception:
+            fired = False
+        self.record(name, fired, time.monotonic() - started, legacy_delay)
+        return fired
+    
+    def record(self, name, fired, elapsed, legacy_delay):
+        """记录一次等待的结果"""
+        with self.lock:
+            stat = self.stats.setdefault(name, {
+                'count': 0, 'fired': 0, 'waited': 0.0, 'legacy': 0.0
+            })
+            stat['count'] += 1
+            stat['fired'] += 1 if fired else 0
+            stat['waited'] += elapsed
+            stat['legacy'] += legacy_delay
+    
+    def skip(self, name, legacy_delay):
+        """记录一个旧版固定等待被直接省去（无需等待任何信号）"""
+        self.record(name, True, 0.0, legacy_delay)
+    
+    def total_saved(self):
+        """相对旧版固定等待累计节省的秒数"""
+        with self.lock:
+            return sum(s['legacy'] - s['waited'] for s in self.stats.values())
+    
+    def summary_lines(self):
+        """按条件输出统计：次数、信号命中数、实际等待、旧版等待、节省时间"""
+        with self.lock:
+            lines = []
+            for name, s in sorted(self.stats.items()):
+                lines.append(
+                    f"{name}: {s['count']}次, 命中{s['fired']}次, "
+                    f"实际等待{s['waited']:.1f}s, 旧版等待{s['legacy']:.1f}s, "
+                    f"节省{s['legacy'] - s['waited']:.1f}s"
+                )
+            return lines
+
+
+def percentile(values, pct):
+    """最近秩法计算百分位数，values 为空时返回 0"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def process_rss(pid=None):
+    """单个进程的常驻内存（字节），读取 /proc，非 Linux 系统上返回 0"""
+    try:
+        with open(f'/proc/{pid or os.getpid()}/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def process_tree_rss(pid=None):
+    """进程及其所有子孙进程（浏览器、驱动）的常驻内存总量（字节）
+    
+    读取 /proc，非 Linux 系统上返回 0。
+    """
+    root = pid or os.getpid()
+    try:
+        entries = [entry for entry in os.listdir('/proc') if entry.isdigit()]
+    except OSError:
+        return 0
+    
+    children = {}
+    for entry in entries:
+        try:
+            with open(f'/proc/{entry}/stat', 'rb') as f:
+                stat = f.read()
+            # 进程名可能包含空格和括号，父进程ID是最后一个 ')' 之后的第二个字段
+            ppid = int(stat[stat.rindex(b')') + 2:].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    
+    total = 0
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        total += process_rss(current)
+        stack.extend(children.get(current, ()))
+    return total
+
+
+def traced(phase):
+    """方法装饰器：把整个方法调用记录为一个阶段 span，server_id 取自同名参数或 server_url
+    
+    同时支持普通方法和协程方法。
+    """
+    def decorator(func):
+        arg_names = func.__code__.co_varnames[:func.__code__.co_argcount]
+        
+        def begin(self, args, kwargs):
+            bound = dict(zip(arg_names[1:], args), **kwargs)
+            server_id = bound.get('server_id') or str(bound.get('server_url', '')).split('/')[-1]
+            return self.tracer.begin(phase, server_id)
+        
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                span = begin(self, args, kwargs)
+                try:
+                    result = await func(self, *args, **kwargs)
+                except Exception as e:
+                    self.tracer.end(span, f"error: {type(e).__name__}")
+                    raise
+                self.tracer.end(span, RunTracer.outcome_of(result))
+                return result
+            return async_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            span = begin(self, args, kwargs)
+            try:
+                result = func(self, *args, **kwargs)
+            except Exception as e:
+                self.tracer.end(span, f"error: {type(e).__name__}")
+                raise
+            self.tracer.end(span, RunTracer.outcome_of(result))
+            return result
+        return wrapper
+    return decorator
+
+
+class RunTracer:
+    """按阶段记录耗时的运行追踪，可导出 JSON 和 Chrome trace-event 文件"""
+    
     def __init__(self):
-        """初始化，从环境变量读取配置"""
+        self.lock = threading.Lock()
+        self.origin = time.monotonic()
+        self.wall_origin = time.time()
+        self.spans = []
+    
+    @staticmethod
+    def outcome_of(result):
+        """把阶段返回值归纳为结果描述"""
+        if isinstance(result, str):
+            return result
+        if isinstance(result, bool):
+            return 'ok' if result else 'fail'
+        if result is None:
+            return 'none'
+        return 'ok'
+    
+    @staticmethod
+    def lane():
+        """当前 span 所属的轨道：事件循环中为任务名，否则为线程名"""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        return task.get_name() if task else threading.current_thread().name
+    
+    def begin(self, name, server_id=''):
+        """开始一个 span"""
+        return {
+            'name': name,
+            'server_id': server_id,
+            'thread': self.lane(),
+            'start': time.monotonic() - self.origin,
+            'duration': 0.0,
+            'outcome': 'ok',
+        }
+    
+    def end(self, span, outcome=None):
+        """结束 span 并记录"""
+        span['duration'] = time.monotonic() - self.origin - span['start']
+        if outcome is not None:
+            span['outcome'] = outcome
+        with self.lock:
+            self.spans.append(span)
+        return span
+    
+    @contextmanager
+    def span(self, name, server_id=''):
+        """上下文管理器形式的 span，可在块内修改 span['outcome']"""
+        span = self.begin(name, server_id)
+        try:
+            yield span
+        except Exception as e:
+            span['outcome'] = f"error: {type(e).__name__}"
+            raise
+        finally:
+            self.end(span)
+    
+    def server_phase_totals(self, server_id):
+        """某服务器各阶段的累计耗时（秒）"""
+        totals = {}
+        with self.lock:
+            for span in self.spans:
+                if span['server_id'] == server_id:
+                    totals[span['name']] = totals.get(span['name'], 0.0) + span['duration']
+        return totals
+    
+    def phase_stats(self):
+        """按阶段统计：阶段名 -> (次数, p50秒, p95秒, 总耗时秒)"""
+        with self.lock:
+            durations = {}
+            for span in self.spans:
+                durations.setdefault(span['name'], []).append(span['duration'])
+        return {
+            name: (len(values), percentile(values, 50), percentile(values, 95), sum(values))
+            for name, values in durations.items()
+        }
+    
+    def summary_lines(self):
+        """阶段耗时汇总表（Markdown）"""
+        stats = self.phase_stats()
+        if not stats:
+            return []
+        lines = [
+            "| 阶段 | 次数 | p50 | p95 | 总耗时 |",
+            "|------|------|-----|-----|--------|",
+        ]
+        for name, (count, p50, p95, total) in sorted(stats.items(), key=lambda item: -item[1][3]):
+            lines.append(f"| {name} | {count} | {p50:.2f}s | {p95:.2f}s | {total:.1f}s |")
+        return lines
+    
+    def export(self, directory):
+        """导出 trace.json 和 Chrome trace-event 格式的 trace.chrome.json"""
+        with self.lock:
+            spans = sorted(self.spans, key=lambda s: s['start'])
+        os.makedirs(directory, exist_ok=True)
+        
+        with open(os.path.join(directory, 'trace.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'started_at': self.wall_origin,
+                'spans': spans,
+                'phases': {
+                    name: {'count': count, 'p50': p50, 'p95': p95, 'total': total}
+                    for name, (count, p50, p95, total) in self.phase_stats().items()
+                },
+            }, f, ensure_ascii=False, indent=2)
+        
+        # 每个任务/线程一条轨道，可直接在 Perfetto / chrome://tracing 中打开
+        thread_ids = {}
+        events = []
+        for span in spans:
+            tid = thread_ids.setdefault(span['thread'], len(thread_ids) + 1)
+            events.append({
+                'name': span['name'],
+                'cat': 'weirdhost',
+                'ph': 'X',
+                'ts': int(span['start'] * 1e6),
+                'dur': int(span['duration'] * 1e6),
+                'pid': 1,
+                'tid': tid,
+                'args': {'server_id': span['server_id'], 'outcome': span['outcome']},
+            })
+        for thread_name, tid in thread_ids.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': tid,
+                           'args': {'name': thread_name}})
+        with open(os.path.join(directory, 'trace.chrome.json'), 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+class PanelApiClient:
+    """Pterodactyl 面板客户端 API 的轻量 HTTP 客户端
+    
+    复用 remember_web cookie 会话，连接池中的连接保持 keep-alive，
+    电源/续期操作直接发送到面板的 /api/client 接口，无需浏览器渲染。
+    """
+    
+    # 面板返回这些错误提示时，说明本周期已经续期过
+    ALREADY_RENEWED_PATTERNS = ["already", "once", "이미", "한번", "불가능"]
+    
+    def __init__(self, base_url, cookies, user_agent, renew_path, pool_size=4, timeout=15):
+        parsed = urlparse(base_url)
+        self.scheme = parsed.scheme or 'https'
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.base_url = f"{self.scheme}://{parsed.netloc}"
+        self.user_agent = user_agent
+        self.renew_path = renew_path
+        self.timeout = timeout
+        
+        # cookie 罐：名称 -> 值，Set-Cookie 会持续更新（会话、XSRF-TOKEN 等）
+        self.cookies = dict(cookies)
+        self.cookie_lock = threading.Lock()
+        
+        # 连接池：最多 pool_size 个保持 keep-alive 的连接
+        self.pool = queue.LifoQueue(maxsize=pool_size)
+        
+        # 遇到 CF 拦截后不再请求，直接交给浏览器
+        self.blocked = False
+    
+    def new_connection(self):
+        """创建一个新的 HTTP(S) 连接"""
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+    
+    def acquire(self):
+        """从连接池取出连接，池空时新建"""
+        try:
+            return self.pool.get_nowait()
+        except queue.Empty:
+            return self.new_connection()
+    
+    def release(self, conn):
+        """归还连接到连接池，池满时关闭"""
+        try:
+            self.pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+    
+    def close(self):
+        """关闭连接池中的所有连接"""
+        while True:
+            try:
+                self.pool.get_nowait().close()
+            except queue.Empty:
+                break
+    
+    def cookie_header(self):
+        with self.cookie_lock:
+            return '; '.join(f"{name}={value}" for name, value in self.cookies.items())
+    
+    def update_cookies(self, response):
+        """从响应的 Set-Cookie 头更新 cookie 罐"""
+        for header in response.headers.get_all('Set-Cookie') or []:
+            parsed = SimpleCookie()
+            try:
+                parsed.load(header)
+            except Exception:
+                continue
+            with self.cookie_lock:
+                for name, morsel in parsed.items():
+                    self.cookies[name] = morsel.value
+    
+    def request(self, method, path, body=None):
+        """发送请求，返回 (状态码, JSON数据或None, 响应头)
+        
+        keep-alive 连接被服务端关闭时自动重连重试一次；已被 CF 拦截时直接返回状态码 0。
+        """
+        if self.blocked:
+            return 0, None, None
+        
+        headers = {
+            'User-Agent': self.user_agent,
+            'Accept': 'application/json',
+            'X-Requested-With': 'XMLHttpRequest',
+            'Referer': self.base_url + '/',
+            'Cookie': self.cookie_header(),
+        }
+        with self.cookie_lock:
+            xsrf_token = self.cookies.get('XSRF-TOKEN')
+        if xsrf_token:
+            headers['X-XSRF-TOKEN'] = unquote(xsrf_token)
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        
+        for attempt in range(2):
+            conn = self.acquire()
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                raw = response.read()
+            except (http.client.HTTPException, ConnectionError, OSError):
+                conn.close()
+                if attempt == 0:
+                    continue
+                raise
+            
+            self.update_cookies(response)
+            if response.will_close:
+                conn.close()
+            else:
+                self.release(conn)
+            
+            data = None
+            if raw and 'json' in (response.getheader('Content-Type') or ''):
+                try:
+                    data = json.loads(raw.decode('utf-8'))
+                except ValueError:
+                    data = None
+            
+            # CF 挑战/拦截：403/503 且返回 HTML 或带 cf-mitigated 头
+            if response.status in (403, 503) and (
+                    response.getheader('cf-mitigated') or data is None):
+                self.blocked = True
+            return response.status, data, response.headers
+    
+    def bootstrap(self):
+        """访问客户端 API 建立会话（获取 XSRF-TOKEN），返回会话是否可用"""
+        status, data, _ = self.request('GET', '/api/client')
+        return status == 200 and data is not None
+    
+    @staticmethod
+    def error_detail(data):
+        """提取 Pterodactyl 错误响应中的提示文本"""
+        if not isinstance(data, dict):
+            return ''
+        details = [str(err.get('detail', '')) for err in data.get('errors', []) if isinstance(err, dict)]
+        if data.get('message'):
+            details.append(str(data['message']))
+        return ' '.join(details)
+    
+    def get_power_state(self, server_id):
+        """查询服务器电源状态（running/starting/stopping/offline），失败返回 None"""
+        status, data, _ = self.request('GET', f'/api/client/servers/{server_id}/resources')
+        if status != 200 or not isinstance(data, dict):
+            return None
+        return data.get('attributes', {}).get('current_state')
+    
+    def try_power_state(self, server_id):
+        """同 get_power_state，连接出错时返回 None"""
+        try:
+            return self.get_power_state(server_id)
+        except (http.client.HTTPException, OSError):
+            return None
+    
+    def get_power_states(self, server_ids, workers=None):
+        """并发查询多个服务器的电源状态，返回 {server_id: 状态或None}，各线程共用连接池"""
+        if not server_ids:
+            return {}
+        workers = max(1, min(workers or self.pool.maxsize, len(server_ids)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='weirdhost-power') as executor:
+            return dict(zip(server_ids, executor.map(self.try_power_state, server_ids)))
+    
+    def send_power_signal(self, server_id, signal):
+        """发送电源信号，面板接受返回 True"""
+        status, _, _ = self.request('POST', f'/api/client/servers/{server_id}/power', {'signal': signal})
+        return status in (200, 202, 204)
+    
+    def renew(self, server_id):
+        """调用续期接口，返回 (结果, 响应数据)
+        
+        结果为 renew_success / already_renewed，面板拒绝时为 None。
+        """
+        status, data, _ = self.request('POST', self.renew_path.format(server_id=server_id))
+        if 200 <= status < 300:
+            return "renew_success", data
+        detail = PanelApiClient.error_detail(data).lower()
+        if 400 <= status < 500 and any(p.lower() in detail for p in self.ALREADY_RENEWED_PATTERNS):
+            return "already_renewed", data
+        return None, data
+
+
+class SelectorCache:
+    """持久化的按钮选择器缓存：按站点、操作记录每个选择器的命中/未命中次数
+    
+    上次命中的选择器排在最前；连续未命中达到 EVICT_AFTER 次的条目被移除。
+    """
+    
+    EVICT_AFTER = 3
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = {}
+        self.dirty = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.data = json.load(f)
+        except (OSError, ValueError):
+            self.data = {}
+    
+    def entries(self, site, action):
+        return self.data.setdefault(site, {}).setdefault(action, {})
+    
+    def winner(self, site, action):
+        """上次命中的选择器，没有时返回 None"""
+        with self.lock:
+            entries = self.entries(site, action)
+            hits = [(e['last_hit'], sel) for sel, e in entries.items() if e.get('last_hit')]
+            return max(hits)[1] if hits else None
+    
+    def ordered(self, site, action, selectors):
+        """按命中次数排序的选择器列表（同分保持原顺序）"""
+        with self.lock:
+            entries = self.entries(site, action)
+            return sorted(selectors, key=lambda sel: -entries.get(sel, {}).get('hits', 0))
+    
+    def record_hit(self, site, action, selector):
+        with self.lock:
+            entry = self.entries(site, action).setdefault(selector, {'hits': 0, 'misses': 0})
+            entry['hits'] += 1
+            entry['consecutive_misses'] = 0
+            entry['last_hit'] = time.time()
+            self.dirty = True
+    
+    def record_miss(self, site, action, selector):
+        with self.lock:
+            entries = self.entries(site, action)
+            entry = entries.setdefault(selector, {'hits': 0, 'misses': 0})
+            entry['misses'] += 1
+            entry['consecutive_misses'] = entry.get('consecutive_misses', 0) + 1
+            if entry['consecutive_misses'] >= self.EVICT_AFTER:
+                del entries[selector]
+            self.dirty = True
+    
+    def stats(self):
+        """各站点、操作的命中/未命中总数"""
+        with self.lock:
+            return {
+                f"{site}/{action}": (
+                    sum(e['hits'] for e in entries.values()),
+                    sum(e['misses'] for e in entries.values()),
+                )
+                for site, actions in self.data.items()
+                for action, entries in actions.items()
+            }
+    
+    def save(self):
+        """有变化时写回磁盘"""
+        with self.lock:
+            if not self.dirty:
+                return
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
+
+class NavigationStats:
+    """按导航统计加载耗时、响应数、传输字节和被拦截的请求
+    
+    full 加载配置下的导航作为基线（指数移动平均）保存到 path；light 配置下与同类
+    导航的基线对比，估算节省的时间和字节。light 配置下某类导航没有基线或基线超过
+    sample_hours 小时时，本次运行用 full 配置采集一次（0 表示不采集）。
+    """
+    
+    # 基线更新时新样本的权重
+    BASELINE_WEIGHT = 0.3
+    
+    def __init__(self, path, sample_hours=24):
+        self.path = path
+        self.sample_age = sample_hours * 3600
+        self.lock = threading.Lock()
+        self.records = []
+        # 页面 -> 当前导航记录，页面后续的响应/拦截都计入这条记录
+        self.current = {}
+        # 本次运行已采集过基线的导航类型
+        self.sampled = set()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.baseline = json.load(f)
+        except (OSError, ValueError):
+            self.baseline = {}
+    
+    def begin(self, page, server_id, label, profile):
+        """开始一次导航记录"""
+        record = {
+            'server_id': server_id,
+            'label': label,
+            'profile': profile,
+            'started': time.monotonic(),
+            'elapsed': 0.0,
+            'responses': 0,
+            'bytes': 0,
+            'blocked': 0,
+            'blocked_types': {},
+        }
+        with self.lock:
+            self.records.append(record)
+            self.current[page] = record
+        return record
+    
+    def finish(self, page):
+        """页面就绪：记录从导航开始到现在的耗时"""
+        with self.lock:
+            record = self.current.get(page)
+            if record is not None:
+                record['elapsed'] = time.monotonic() - record['started']
+    
+    def on_response(self, page, response):
+        try:
+            size = int(response.headers.get('content-length') or 0)
+        except ValueError:
+            size = 0
+        with self.lock:
+            record = self.current.get(page)
+            if record is not None:
+                record['responses'] += 1
+                record['bytes'] += size
+    
+    def on_blocked(self, page, resource_type):
+        with self.lock:
+            record = self.current.get(page)
+            if record is not None:
+                record['blocked'] += 1
+                record['blocked_types'][resource_type] = record['blocked_types'].get(resource_type, 0) + 1
+    
+    def release(self, page):
+        with self.lock:
+            self.current.pop(page, None)
+    
+    def profile(self, page):
+        """页面当前导航的加载配置，没有记录时返回 None"""
+        with self.lock:
+            record = self.current.get(page)
+            return record['profile'] if record else None
+    
+    def claim_sample(self, label):
+        """light 配置下这次导航是否改用 full 配置采集基线（每类导航每次运行最多一次）"""
+        with self.lock:
+            if not self.sample_age or label in self.sampled:
+                return False
+            base = self.baseline.get(label)
+            if base and time.time() - base.get('updated_at', 0) < self.sample_age:
+                return False
+            self.sampled.add(label)
+            return True
+    
+    def saved(self, record):
+        """相对基线节省的 (秒, 字节)，没有基线时返回 None"""
+        base = self.baseline.get(record['label'])
+        if record['profile'] != 'light' or not base:
+            return None
+        return base['elapsed'] - record['elapsed'], base['bytes'] - record['bytes']
+    
+    def totals(self):
+        """所有导航的汇总：(导航数, 拦截请求数, 节省秒数, 节省字节数)，没有可对比的基线时节省为 None"""
+        with self.lock:
+            records = list(self.records)
+        savings = [s for s in map(self.saved, records) if s]
+        if not savings:
+            return len(records), sum(r['blocked'] for r in records), None, None
+        return (len(records), sum(r['blocked'] for r in records),
+                sum(s[0] for s in savings), sum(s[1] for s in savings))
+    
+    def summary_lines(self):
+        """按导航类型输出统计"""
+        with self.lock:
+            records = list(self.records)
+        grouped = {}
+        for record in records:
+            grouped.setdefault((record['label'], record['profile']), []).append(record)
+        
+        lines = []
+        for (label, profile), items in sorted(grouped.items()):
+            count = len(items)
+            line = (f"{label} [{profile}]: {count}次, 平均 {sum(r['elapsed'] for r in items) / count:.1f}s, "
+                    f"{sum(r['bytes'] for r in items) / count / 1024:.0f}KB, "
+                    f"拦截 {sum(r['blocked'] for r in items)} 个请求")
+            savings = [s for s in map(self.saved, items) if s]
+            if savings:
+                line += (f", 相对基线节省 {sum(s[0] for s in savings):.1f}s / "
+                         f"{sum(s[1] for s in savings) / 1024:.0f}KB")
+            elif profile == 'light':
+                line += ", 无 full 基线，节省不可用"
+            lines.append(line)
+        return lines
+    
+    def save(self):
+        """用 full 配置下的导航更新基线并写回磁盘"""
+        with self.lock:
+            samples = [r for r in self.records if r['profile'] == 'full' and r['elapsed']]
+        if not samples:
+            return
+        for record in samples:
+            base = self.baseline.get(record['label'])
+            if base is None:
+                self.baseline[record['label']] = {'elapsed': record['elapsed'], 'bytes': record['bytes'],
+                                                  'updated_at': time.time()}
+                continue
+            for key in ('elapsed', 'bytes'):
+                base[key] += self.BASELINE_WEIGHT * (record[key] - base[key])
+            base['updated_at'] = time.time()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.baseline, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+@dataclass
+class ServerResult:
+    """单个服务器一次运行的处理结果"""
+    
+    # 视为成功的续期/启动状态（未到续期时间也视为续期正常）
+    RENEW_OK = ('renew_success', 'already_renewed', 'renew_not_due')
+    START_OK = ('start_success', 'already_started')
+    
+    server_id: str
+    server_url: str = ''
+    run_id: str = ''
+    renew_status: str = '未执行'
+    start_status: str = '未执行'
+    # 处理方式：api / browser / api+browser
+    via: str = ''
+    attempts: int = 0
+    started_at: float = 0.0
+    finished_at: float = 0.0
+    duration: float = 0.0
+    # 各阶段耗时（秒）
+    timings: dict = field(default_factory=dict)
+    # 最近一次成功续期/启动的时间戳（跨运行延续）
+    last_renew_success_at: float = 0.0
+    last_start_success_at: float = 0.0
+    # 面板上观察到的服务器到期时间戳（跨运行延续）
+    observed_expiry: float = 0.0
+    # 多账户模式下所属账户名称
+    account: str = ''
+    
+    @property
+    def renew_ok(self):
+        return self.renew_status in self.RENEW_OK
+    
+    @property
+    def start_ok(self):
+        return self.start_status in self.START_OK
+    
+    @property
+    def combined(self):
+        """组合结果字符串，例如 renew:renew_success,start:start_success"""
+        return f"renew:{self.renew_status},start:{self.start_status}"
+    
+    def to_dict(self):
+        return asdict(self)
+    
+    @classmethod
+    def from_dict(cls, data):
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+class StateStore:
+    """JSON Lines 格式的增量结果存储
+    
+    每处理完一个服务器追加一行记录；加载时按服务器ID建立索引，
+    之后查询最近记录和历史记录都是 O(1)。文件过大时压缩为每个服务器最近 N 条。
+    同一次运行（run_id 相同）的重试结果替换该服务器的上一条记录，每次运行只保留一条。
+    """
+    
+    def __init__(self, path, history_size=20):
+        self.path = path
+        self.history_size = history_size
+        self.lock = threading.Lock()
+        # server_id -> 最近 history_size 条记录（旧 -> 新）
+        self.history_index = {}
+        self.line_count = 0
+        self.load()
+    
+    def load(self):
+        """读取存储文件并建立索引，损坏的行直接跳过"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = ServerResult.from_dict(json.loads(line))
+                except (ValueError, TypeError):
+                    continue
+                self.index(record)
+                self.line_count += 1
+    
+    def index(self, record):
+        """把记录加入索引，替换了同一次运行的上一条记录时返回 True"""
+        history = self.history_index.setdefault(record.server_id, deque(maxlen=self.history_size))
+        if record.run_id and history and history[-1].run_id == record.run_id:
+            history[-1] = record
+            return True
+        history.append(record)
+        return False
+    
+    def latest(self, server_id):
+        """某服务器最近一条记录，没有时返回 None"""
+        history = self.history_index.get(server_id)
+        return history[-1] if history else None
+    
+    def history(self, server_id):
+        """某服务器最近的历史记录列表（旧 -> 新）"""
+        return list(self.history_index.get(server_id, ()))
+    
+    def server_ids(self):
+        """有历史记录的服务器ID"""
+        return list(self.history_index)
+    
+    def append(self, record):
+        """追加一条记录并更新索引（索引中保存副本，之后对 record 的修改不影响历史）"""
+        record = ServerResult.from_dict(record.to_dict())
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # 同一次运行的重试结果：替换上一条记录后重写文件，不再追加新行
+            if self.index(record):
+                self.compact()
+                return
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record.to_dict(), ensure_ascii=False, separators=(',', ':')) + '\n')
+            self.line_count += 1
+            
+            # 行数远超保留数量时压缩文件
+            if self.line_count > 2 * self.history_size * max(1, len(self.history_index)):
+                self.compact()
+    
+    def compact(self):
+        """重写存储文件，每个服务器只保留最近 history_size 条记录"""
+        records = sorted(
+            (r for history in self.history_index.values() for r in history),
+            key=lambda r: r.finished_at
+        )
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record.to_dict(), ensure_ascii=False, separators=(',', ':')) + '\n')
+        os.replace(tmp_path, self.path)
+        self.line_count = len(records)
+
+
+class CircuitBreaker:
+    """全站 CF 拦截熔断器
+    
+    连续 threshold 个服务器都因 CF 挑战或续期按钮不可用而失败时打开熔断，剩余服务器不再做浏览器操作；
+    冷却 cooldown 秒后由一次轻量探测决定恢复（closed）还是放弃本次运行（blocked）。
+    """
+    
+    def __init__(self, threshold=3, cooldown=120):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        # closed / open / blocked
+        self.state = 'closed'
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        # 熔断打开后只允许一个任务探测，其余任务等待探测结果
+        self.lock = asyncio.Lock()
+    
+    @property
+    def blocked(self):
+        return self.state == 'blocked'
+    
+    @staticmethod
+    def is_block_failure(result, hint=None):
+        """是否为 CF 拦截造成的失败：处理中检测到未通过的 CF 挑战，或续期按钮始终不可用"""
+        if result.renew_ok and result.start_ok:
+            return False
+        return hint == 'cf_block' or result.renew_status == 'renew_button_disabled'
+    
+    def record(self, block_failure):
+        """记录一个服务器的结果，本次记录使熔断打开时返回 True"""
+        if self.state != 'closed':
+            return False
+        if not block_failure:
+            self.consecutive = 0
+            return False
+        self.consecutive += 1
+        if self.consecutive < self.threshold:
+            return False
+        self.state = 'open'
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        return True
+    
+    def cooldown_left(self):
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+    
+    def close(self):
+        self.state = 'closed'
+        self.consecutive = 0
+    
+    def give_up(self):
+        self.state = 'blocked'
+
+
+class DeadlinePlanner:
+    """浏览器处理服务器前的执行计划：到期最早的服务器最先处理，并预估每个服务器的耗时
+    
+    到期时间取面板上观察到的到期时间，没有时用上次成功续期时间加续期周期估算；
+    没有任何历史记录的服务器视为最紧急。单个服务器的成本取其历史耗时的高百分位，
+    没有历史耗时时取其他服务器成本的中位数。计划不预先舍弃服务器，派发时再对照剩余预算。
+    """
+    
+    # 所有服务器都没有历史耗时时的默认成本（秒）
+    DEFAULT_COST = 90.0
+    COST_PERCENTILE = 75
+    
+    def __init__(self, state_store, renew_interval, spacing=0.0, default_cost=DEFAULT_COST):
+        self.state_store = state_store
+        self.renew_interval = renew_interval
+        # 同一页面相邻两个服务器之间的间隔，计入每个服务器的成本
+        self.spacing = spacing
+        self.default_cost = default_cost
+    
+    def estimate_cost(self, server_id):
+        """预估浏览器处理耗时（秒）：最近几次浏览器处理耗时的高百分位，没有历史耗时时返回 None"""
+        durations = [r.timings['browser'] for r in self.state_store.history(server_id) if r.timings.get('browser')]
+        return percentile(durations, self.COST_PERCENTILE) if durations else None
+    
+    def fallback_cost(self):
+        """没有历史耗时的服务器的成本：有历史耗时的服务器成本的中位数"""
+        known = [cost for cost in map(self.estimate_cost, self.state_store.server_ids()) if cost is not None]
+        return percentile(known, 50) if known else self.default_cost
+    
+    def deadline(self, server_id):
+        """预估到期时间戳，未知时返回 0（最紧急）"""
+        latest = self.state_store.latest(server_id)
+        if latest is None:
+            return 0.0
+        if latest.observed_expiry:
+            return latest.observed_expiry
+        if latest.last_renew_success_at:
+            return latest.last_renew_success_at + self.renew_interval
+        return 0.0
+    
+    def plan(self, server_urls):
+        """制定计划，返回 (按到期时间排序的服务器, {server_url: (到期时间, 预估成本)})"""
+        fallback = None
+        estimates = {}
+        for url in server_urls:
+            server_id = url.split('/')[-1]
+            cost = self.estimate_cost(server_id)
+            if cost is None:
+                if fallback is None:
+                    fallback = self.fallback_cost()
+                cost = fallback
+            estimates[url] = (self.deadline(server_id), cost + self.spacing)
+        return sorted(server_urls, key=lambda url: estimates[url][0]), estimates
+
+
+class OperationJournal:
+    """运行检查点：每个服务器的续期/启动步骤完成后立即追加一行（JSON Lines）
+    
+    运行正常结束时删除；运行被超时终止或崩溃时日志保留下来，下次运行读取它，
+    沿用已成功的步骤，从未完成的服务器继续。超过 max_age_hours 的记录视为过期。
+    """
+    
+    def __init__(self, path, max_age_hours=6):
+        self.path = path
+        self.max_age = max_age_hours * 3600
+        self.lock = threading.Lock()
+    
+    def load(self):
+        """读取未过期的检查点：server_id -> {'renew': 状态, 'start': 状态, 'via': 方式, 'run_id': 运行ID}"""
+        entries = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            return entries
+        cutoff = time.time() - self.max_age
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict) or record.get('at', 0) < cutoff:
+                continue
+            entry = entries.setdefault(record['server_id'], {})
+            entry[record['step']] = record['status']
+            entry['via'] = record.get('via', '')
+            entry['run_id'] = record.get('run_id', '')
+        return entries
+    
+    def record(self, server_id, step, status, via='', run_id=''):
+        """追加一个步骤的结果，写入后立即落盘"""
+        line = json.dumps({'server_id': server_id, 'step': step, 'status': status, 'via': via,
+                           'run_id': run_id, 'at': time.time()}, ensure_ascii=False, separators=(',', ':'))
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+    
+    def clear(self):
+        """运行完整结束后删除检查点"""
+        with self.lock:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class AdaptiveTimeouts:
+    """按服务器、阶段记录观察到的耗时，从历史推导下一次等待的超时（毫秒）
+    
+    超时 = 历史 p95 × FACTOR + MARGIN，限制在阶段的下限和上限之间；样本不足时使用默认值。
+    等待超时时把超时值本身记为样本，偏慢的服务器的超时会逐次放宽。
+    """
+    
+    # 阶段 -> (默认超时, 下限, 上限)
+    PHASES = {
+        'navigation': (120000, 10000, 180000),
+        # full 配置（等待网络空闲）的导航单独学习，不与 light 配置的样本混在一起
+        'navigation_full': (120000, 10000, 180000),
+        'content': (15000, 3000, 30000),
+        'networkidle': (20000, 3000, 30000),
+        'selector': (8000, 2000, 20000),
+        'login': (90000, 15000, 120000),
+    }
+    FACTOR = 1.5
+    MARGIN = 2000
+    PERCENTILE = 95
+    MIN_SAMPLES = 3
+    HISTORY_SIZE = 20
+    
+    def __init__(self, path, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        # "server_id/阶段" -> 最近的耗时样本（毫秒）
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.samples = json.load(f)
+        except (OSError, ValueError):
+            self.samples = {}
+        # 本次运行使用了非默认超时的 "server_id/阶段" -> 超时
+        self.adjusted = {}
+    
+    def timeout(self, server_id, phase):
+        """该服务器该阶段本次使用的超时（毫秒）"""
+        default, floor, ceiling = self.PHASES[phase]
+        key = f"{server_id}/{phase}"
+        with self.lock:
+            samples = self.samples.get(key, [])
+            if not self.enabled or len(samples) < self.MIN_SAMPLES:
+                return default
+            value = int(min(ceiling, max(floor, percentile(samples, self.PERCENTILE) * self.FACTOR + self.MARGIN)))
+            if value != default:
+                self.adjusted[key] = value
+            return value
+    
+    def observe(self, server_id, phase, elapsed_ms):
+        with self.lock:
+            samples = self.samples.setdefault(f"{server_id}/{phase}", [])
+            samples.append(round(elapsed_ms))
+            del samples[:-self.HISTORY_SIZE]
+    
+    def summary_lines(self):
+        """本次调整过的超时：默认值 -> 实际值"""
+        with self.lock:
+            return [f"{key}: {self.PHASES[key.rsplit('/', 1)[1]][0]}ms -> {value}ms"
+                    for key, value in sorted(self.adjusted.items())]
+    
+    def save(self):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.samples, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+
+
+class StorageStateCache:
+    """加密的浏览器 storage_state 磁盘缓存
+    
+    保存登录后的 cookies（含 cf_clearance）和 localStorage，下次运行直接复用，
+    跳过登录流程。使用 Fernet 加密，未安装 cryptography 时缓存不可用（不会明文落盘）。
+    """
+    
+    # 这些 cookie 的过期时间决定缓存的有效期
+    CRITICAL_COOKIE_PREFIXES = ('cf_clearance', 'remember_web_')
+    
+    def __init__(self, path, secret, fingerprint, max_age_hours=24):
+        self.path = path
+        self.secret = secret
+        self.fingerprint = fingerprint
+        self.max_age = max_age_hours * 3600
+        self.cipher = None
+    
+    @property
+    def enabled(self):
+        return Fernet is not None and bool(self.secret)
+    
+    @property
+    def fernet(self):
+        """首次使用时才派生密钥（PBKDF2 十万次迭代），无需读写缓存的运行不付出这部分耗时"""
+        if self.cipher is None and self.enabled:
+            key = hashlib.pbkdf2_hmac('sha256', self.secret.encode('utf-8'), b'weirdhost-storage-state', 100000)
+            self.cipher = Fernet(base64.urlsafe_b64encode(key))
+        return self.cipher
+    
+    def expires_at(self, storage_state, saved_at):
+        """缓存过期时间：最长保存时间与关键 cookie 过期时间中较早者"""
+        expires = saved_at + self.max_age
+        for cookie in storage_state.get('cookies', []):
+            if cookie.get('name', '').startswith(self.CRITICAL_COOKIE_PREFIXES) and cookie.get('expires', -1) > 0:
+                expires = min(expires, cookie['expires'])
+        return expires
+    
+    def load(self):
+        """读取缓存，返回 (storage_state, 原因)；缓存不可用时 storage_state 为 None"""
+        if not self.enabled:
+            return None, "未安装 cryptography 或未配置密钥"
+        if not os.path.exists(self.path):
+            return None, "无缓存"
+        try:
+            with open(self.path, 'rb') as f:
+                record = json.loads(self.fernet.decrypt(f.read()).decode('utf-8'))
+        except (InvalidToken, ValueError, OSError):
+            self.invalidate()
+            return None, "缓存无法解密或已损坏"
+        
+        if record.get('fingerprint') != self.fingerprint:
+            self.invalidate()
+            return None, "认证信息已变更"
+        if time.time() >= record.get('expires_at', 0):
+            self.invalidate()
+            return None, "缓存已过期"
+        return record['storage_state'], "缓存有效"
+    
+    def save(self, storage_state):
+        """加密保存 storage_state"""
+        if not self.enabled:
+            return False
+        saved_at = time.time()
+        record = {
+            'fingerprint': self.fingerprint,
+            'saved_at': saved_at,
+            'expires_at': self.expires_at(storage_state, saved_at),
+            'storage_state': storage_state,
+        }
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.fernet.encrypt(json.dumps(record).encode('utf-8')))
+        os.replace(tmp_path, self.path)
+        return True
+    
+    def invalidate(self):
+        """删除缓存文件"""
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class RetryScheduler:
+    """失败服务器的延后重试队列
+    
+    按失败原因（CF拦截、超时、按钮缺失、未知）分类，每类有各自的首次退避时间和最多重试次数；
+    退避时间按重试次数指数增长并加入随机抖动。所有重试都受全局时间预算限制，
+    预算不足以完成一次重试时不再排队。
+    """
+    
+    # 失败原因 -> (首次退避秒数, 最多重试次数)
+    POLICIES = {
+        'cf_block': (60, 2),
+        'timeout': (10, 2),
+        'button_missing': (15, 1),
+        'unknown': (10, 1),
+    }
+    MAX_DELAY = 300
+    
+    # 这些状态表示结果已确定，重试不会改变
+    FINAL_STATUSES = ('login_failed', 'renew_rejected', 'skipped', 'cf_blocked', 'dropped_budget')
+    
+    def __init__(self, budget_seconds, seed=None):
+        self.deadline = time.monotonic() + budget_seconds
+        self.random = random.Random(seed)
+        # server_id -> 已重试次数
+        self.attempts = {}
+        # 失败原因 -> 排队次数
+        self.causes = {}
+        self.recovered = 0
+    
+    def remaining(self):
+        """剩余时间预算（秒）"""
+        return self.deadline - time.monotonic()
+    
+    def should_retry(self, result):
+        """续期或启动未成功，且失败不是确定性的"""
+        if result.renew_ok and result.start_ok:
+            return False
+        return not any(status in self.FINAL_STATUSES for status in (result.renew_status, result.start_status))
+    
+    @staticmethod
+    def classify(result, hint=None):
+        """失败原因：优先使用处理过程中记录的提示，否则按状态推断"""
+        if hint in RetryScheduler.POLICIES:
+            return hint
+        statuses = (result.renew_status, result.start_status)
+        if 'renew_button_disabled' in statuses:
+            return 'cf_block'
+        if 'no_renew_button' in statuses or 'no_start_button' in statuses:
+            return 'button_missing'
+        return 'unknown'
+    
+    def next_delay(self, server_id, cause, cost):
+        """排队一次重试，返回退避秒数；重试次数用完或剩余预算不足 delay + cost 时返回 None"""
+        base, limit = self.POLICIES[cause]
+        attempt = self.attempts.get(server_id, 0)
+        if attempt >= limit:
+            return None
+        delay = min(self.MAX_DELAY, base * 2 ** attempt) * self.random.uniform(0.5, 1.5)
+        if delay + cost > self.remaining():
+            return None
+        self.attempts[server_id] = attempt + 1
+        self.causes[cause] = self.causes.get(cause, 0) + 1
+        return delay
+    
+    def total_retries(self):
+        return sum(self.attempts.values())
+
+
+class WeirdhostAuto:
+    # 到期时间：关键字后面的 YYYY-MM-DD [HH:MM[:SS]]
+    EXPIRY_PATTERN = re.compile(
+        r'(?:유통기한|만료|expir\w*|到期)[^0-9]{0,40}'
+        r'(\d{4})[-./](\d{1,2})[-./](\d{1,2})(?:[ T]+(\d{1,2}):(\d{2})(?::(\d{2}))?)?',
+        re.IGNORECASE
+    )
+    
+    # remember_web 会话 cookie 名称
+    REMEMBER_COOKIE_NAME = 'remember_web_59ba36addc2b2f9401580f014c7f58ea4e30989d'
+    USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+    
+    # 就绪条件：名称 -> (截止时间秒, 旧版固定等待秒)
+    READY_CONDITIONS = {
+        'page_settled': (3, 3),
+        'renew_button_present': (3, 2),
+        'renew_button_enabled': (5, 5),
+        'renew_hover': (0, 1),
+        'renew_response': (8, 8),
+        'renew_toast': (3, 0),
+        'renew_settled': (5, 5),
+        'start_button_enabled': (5, 5),
+        'start_hover': (0, 1),
+        'start_response': (8, 8),
+        'start_button_disabled': (3, 0),
+        'cf_clear': (20, 10),
+    }
+    
+    # light 加载配置拦截的资源类型和第三方统计/广告域名
+    BLOCKED_RESOURCE_TYPES = ('image', 'font', 'media')
+    BLOCKED_HOSTS = (
+        'google-analytics.com', 'googletagmanager.com', 'doubleclick.net',
+        'googlesyndication.com', 'googleadservices.com', 'facebook.net',
+        'hotjar.com', 'clarity.ms', 'cloudflareinsights.com',
+    )
+    # CF 挑战相关资源始终放行
+    CF_CHALLENGE_HOSTS = ('challenges.cloudflare.com',)
+    CF_CHALLENGE_PATH = '/cdn-cgi/'
+    
+    # 同一页面处理相邻两个服务器之间的间隔（秒）
+    SERVER_INTERVAL = 8
+    
+    # 电源状态批量探测的并发请求数
+    POWER_PROBE_WORKERS = 8
+    
+    # 缓存的胜出选择器单独尝试的超时（毫秒），其余选择器同时竞争的超时见 AdaptiveTimeouts
+    SELECTOR_WINNER_TIMEOUT = 3000
+    
+    # 结果提示框（toast/alert），DOM 文本回退检查只读取其中的文本
+    NOTIFICATION_SELECTOR = '.toast, [role="alert"], .notification, .alert, .swal2-popup'
+    NOTIFICATION_TEXT_LIMIT = 500
+    NOTIFICATION_TEXT_SCRIPT = """(limit) => Array.from(document.querySelectorAll(
+        '.toast, [role="alert"], .notification, .alert, .swal2-popup'))
+        .map(el => el.innerText || '').join('\\n').slice(0, limit)"""
+    
+    # 到期时间文本：只返回页面正文中到期关键字附近的一小段，避免把整页文本复制到 Python
+    EXPIRY_TEXT_SCRIPT = """() => {
+        const text = document.body ? document.body.innerText : '';
+        const index = text.search(/유통기한|만료|expir|到期/i);
+        return index < 0 ? '' : text.slice(index, index + 120);
+    }"""
+    
+    # 按钮快照：一次求值收集所有 <button> 和 .btn/.button 元素，写入 data-wh-handle 作为定位句柄
+    BUTTON_SCAN_SCRIPT = """(token) => {
+        const visible = el => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+        const seen = new Set();
+        const result = [];
+        for (const el of document.querySelectorAll('button, .btn, .button')) {
+            if (seen.has(el)) continue;
+            seen.add(el);
+            const handle = `${token}-${result.length}`;
+            el.setAttribute('data-wh-handle', handle);
+            result.push({
+                handle: handle,
+                text: (el.textContent || '').trim(),
+                visible: visible(el),
+                enabled: !el.disabled && el.getAttribute('aria-disabled') !== 'true',
+                is_button: el.tagName === 'BUTTON',
+            });
+        }
+        return result;
+    }"""
+    
+    # CF 挑战检测：一次求值检查挑战元素、挑战框架、标题和正文标记，返回分类
+    CF_DETECT_SCRIPT = """() => {
+        const visible = el => !!el && !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+        const selectors = ['#challenge-form', '.challenge-form', '#challenge-running',
+                           '#cf-content', '#challenge-stage', '#cf-challenge-running'];
+        const markers = selectors.filter(sel => visible(document.querySelector(sel)));
+        const frame = document.querySelector('iframe[src*="challenges.cloudflare.com"]');
+        if (visible(frame)) markers.push('challenge-frame');
+        const title = (document.title || '').toLowerCase();
+        const text = (document.body ? document.body.innerText.slice(0, 3000) : '').toLowerCase();
+        for (const phrase of ['checking your browser', 'verify you are human', 'security check', 'just a moment']) {
+            if (title.includes(phrase) || text.includes(phrase)) markers.push(phrase);
+        }
+        if (title.includes('attention required') || text.includes('you have been blocked')) {
+            return {kind: 'blocked', markers: markers.concat(['blocked'])};
+        }
+        return {kind: markers.length ? 'challenge' : 'none', markers: markers};
+    }"""
+    
+    def __init__(self, account=None):
+        """初始化，从环境变量读取配置
+        
+        account 为多账户配置中的单个账户（见 load_accounts），其认证信息和服务器列表
+        覆盖环境变量，缓存和追踪文件写入以账户名命名的子目录。
+        """
+        account = account or {}
+        self.account_name = account.get('name', '')
+        
         self.url = os.getenv('WEIRDHOST_URL', 'https://hub.weirdhost.xyz')
-        self.server_urls = os.getenv('WEIRDHOST_SERVER_URLS', '')
+        self.server_urls = ','.join(account['servers']) if account else os.getenv('WEIRDHOST_SERVER_URLS', '')
         self.login_url = os.getenv('WEIRDHOST_LOGIN_URL', 'https://hub.weirdhost.xyz/auth/login')
         
         # 获取认证信息
-        self.remember_web_cookie = os.getenv('REMEMBER_WEB_COOKIE', '')
-        self.email = os.getenv('WEIRDHOST_EMAIL', '')
-        self.password = os.getenv('WEIRDHOST_PASSWORD', '')
+        self.remember_web_cookie = account.get('remember_web_cookie', '') if account else os.getenv('REMEMBER_WEB_COOKIE', '')
+        self.email = account.get('email', '') if account else os.getenv('WEIRDHOST_EMAIL', '')
+        self.password = account.get('password', '') if account else os.getenv('WEIRDHOST_PASSWORD', '')
         
         # 浏览器配置
         self.headless = os.getenv('HEADLESS', 'true').lower() == 'true'
         self.slow_mo = int(os.getenv('SLOW_MO', '100'))  # 添加延迟模拟人类操作
         
+        # 页面加载配置：light 拦截图片/字体/媒体和第三方统计并以 domcontentloaded 为准，full 为旧版 networkidle
+        self.load_profile = 'full' if os.getenv('WEIRDHOST_LOAD_PROFILE', 'light').lower() == 'full' else 'light'
+        self.wait_until = 'networkidle' if self.load_profile == 'full' else 'domcontentloaded'
+        
+        # 面板 API 快速通道：auto 表示先走 HTTP API，被拒绝时回退到浏览器；off 表示只用浏览器
+        self.api_mode = os.getenv('WEIRDHOST_API_MODE', 'auto').lower()
+        self.renew_api_path = os.getenv('WEIRDHOST_RENEW_API_PATH', '/api/client/notfreeservers/{server_id}/renew')
+        
+        # 登录状态缓存：加密保存 storage_state，下次运行跳过登录
+        self.cache_dir = os.getenv('WEIRDHOST_CACHE_DIR', '.weirdhost-cache')
+        if self.account_name:
+            self.cache_dir = os.path.join(self.cache_dir, self.account_name)
+        cache_secret = os.getenv('WEIRDHOST_CACHE_KEY', '')
+        if not cache_secret and (self.remember_web_cookie or self.email):
+            cache_secret = f"{self.remember_web_cookie}|{self.email}|{self.password}"
+        fingerprint = hashlib.sha256(f"{self.url}|{self.remember_web_cookie}|{self.email}".encode('utf-8')).hexdigest()
+        self.state_cache = StorageStateCache(
+            os.path.join(self.cache_dir, 'storage_state.enc'),
+            cache_secret,
+            fingerprint,
+            max_age_hours=float(os.getenv('WEIRDHOST_STATE_MAX_AGE_HOURS', '24'))
+        )
+        
+        # 续期计划：距上次成功续期不足一个周期且未临近到期的服务器直接跳过
+        self.schedule_enabled = os.getenv('WEIRDHOST_SCHEDULE', 'on').lower() != 'off'
+        self.renew_interval = float(os.getenv('WEIRDHOST_RENEW_INTERVAL_HOURS', '24')) * 3600
+        self.renew_slack = float(os.getenv('WEIRDHOST_RENEW_SLACK_MINUTES', '60')) * 60
+        self.renew_margin = float(os.getenv('WEIRDHOST_RENEW_MARGIN_HOURS', '24')) * 3600
+        # 面板显示时间的时区（Weirdhost 为韩国时间 UTC+9）
+        self.panel_tz = timezone(timedelta(hours=float(os.getenv('WEIRDHOST_PANEL_UTC_OFFSET', '9'))))
+        
+        # 并发配置：同一浏览器上下文中同时处理的服务器（页面）数量（1 表示按顺序逐个处理）
+        self.concurrency = max(1, int(os.getenv('WEIRDHOST_CONCURRENCY', '1')))
+        
         # 解析服务器URL列表
         self.server_list = []
         if self.server_urls:
             self.server_list = [url.strip() for url in self.server_urls.split(',') if url.strip()]
         
-        # 存储每个服务器的结果
+        # 存储每个服务器的结果 server_id -> ServerResult（API 通道在线程中写入，需加锁）
+        self.run_id = os.getenv('GITHUB_RUN_ID') or datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
         self.server_results = {}
+        self.results_lock = threading.Lock()
+        
+        # 增量结果存储：每个服务器处理完追加一条记录，按服务器ID索引历史
+        self.state_store = StateStore(os.path.join(self.cache_dir, 'state.jsonl'))
+        self.recorded_servers = set()
+        
+        # 运行检查点：被超时终止或崩溃后，下次运行从未完成的服务器继续
+        self.journal = OperationJournal(os.path.join(self.cache_dir, 'journal.jsonl'),
+                                        max_age_hours=float(os.getenv('WEIRDHOST_JOURNAL_MAX_AGE_HOURS', '6')))
+        self.resumed = 0
+        
+        # 已通过 API 完成的操作：server_id -> {'renew': 结果, 'start': 结果}，浏览器阶段跳过
+        self.completed_actions = {}
+        self.api_session_ok = False
+        
+        # 就绪等待统计
+        self.readiness = ReadinessTracker()
+        
+        # 按站点、操作记录上次胜出的按钮选择器
+        self.selector_cache = SelectorCache(os.path.join(self.cache_dir, 'selectors.json'))
+        
+        # 自适应超时：按服务器、阶段的历史耗时推导导航、内容加载、选择器和登录的等待超时
+        self.timeouts = AdaptiveTimeouts(os.path.join(self.cache_dir, 'latency.json'),
+                                         enabled=os.getenv('WEIRDHOST_ADAPTIVE_TIMEOUTS', 'on').lower() != 'off')
+        
+        # 导航统计，full 配置下的结果作为 light 配置的对比基线（light 下定期用 full 采集一次）
+        self.baseline_sample_hours = float(os.getenv('WEIRDHOST_BASELINE_SAMPLE_HOURS', '24'))
+        self.navigation = NavigationStats(os.path.join(self.cache_dir, 'navigation_baseline.json'),
+                                          self.baseline_sample_hours)
+        
+        # 阶段耗时追踪，运行结束后导出到 WEIRDHOST_TRACE_DIR
+        self.tracer = RunTracer()
+        self.trace_dir = os.getenv('WEIRDHOST_TRACE_DIR', '.weirdhost-trace')
+        if self.account_name:
+            self.trace_dir = os.path.join(self.trace_dir, self.account_name)
+        
+        # 多账户模式：同时运行的账户进程数量
+        self.account_workers = max(1, int(os.getenv('WEIRDHOST_ACCOUNT_WORKERS', '0')) or os.cpu_count() or 1)
+        
+        # 延后重试：失败的服务器在运行末尾按原因退避重试，总耗时受全局时间预算限制（应小于工作流超时）
+        self.time_budget = float(os.getenv('WEIRDHOST_TIME_BUDGET_MINUTES', '25')) * 60
+        self.retry = RetryScheduler(self.time_budget)
+        self.planner = DeadlinePlanner(self.state_store, self.renew_interval, spacing=self.SERVER_INTERVAL)
+        # server_url -> 执行计划预估的耗时（秒），首次派发时取出对照剩余预算
+        self.plan_costs = {}
+        
+        # CF 熔断：连续多个服务器被 CF 拦截时停止剩余的浏览器操作，冷却后探测一次
+        self.breaker_threshold = int(os.getenv('WEIRDHOST_CF_BREAKER_THRESHOLD', '3'))
+        self.breaker_cooldown = float(os.getenv('WEIRDHOST_CF_BREAKER_COOLDOWN_SECONDS', '120'))
+        self.breaker = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+        # server_id -> 本次尝试中观察到的失败原因（cf_block / timeout），供重试分类
+        self.failure_hints = {}
+        
+        # 守护模式：常驻一个已登录的浏览器，按各服务器的处理周期（加随机抖动）循环处理，
+        # 浏览器进程树内存超过上限或浏览器崩溃时重启浏览器
+        self.daemon_interval = float(os.getenv('WEIRDHOST_DAEMON_INTERVAL_MINUTES', '60')) * 60
+        self.daemon_jitter = float(os.getenv('WEIRDHOST_DAEMON_JITTER_MINUTES', '10')) * 60
+        self.daemon_max_rss = float(os.getenv('WEIRDHOST_DAEMON_MAX_RSS_MB', '1500')) * 1024 * 1024
+        
+        # 内存上限：页面处理 recycle_every 个服务器或进程树内存超过 recycle_rss 后关闭并新建页面；
+        # 每批服务器之间内存仍超过上限时用当前登录状态新建浏览器上下文
+        self.recycle_every = max(1, int(os.getenv('WEIRDHOST_RECYCLE_EVERY', '20')))
+        self.recycle_rss = float(os.getenv('WEIRDHOST_RECYCLE_RSS_MB', '1200')) * 1024 * 1024
+        # 内存统计：进程树/Python 峰值（字节）和回收次数
+        self.memory = {'tree_peak': 0, 'python_peak': 0, 'pages_recycled': 0, 'contexts_recycled': 0}
     
     def log(self, message, level="INFO"):
         """日志输出"""
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        print(f"[{timestamp}] {level}: {message}")
+        if self.account_name:
+            message = f"[{self.account_name}] {message}"
+        print(f"[{timestamp}] {level}: {message}", flush=True)
+    
+    async def wait_ready(self, name, condition):
+        """按 READY_CONDITIONS 中的截止时间等待就绪条件，返回信号是否出现"""
+        deadline, legacy_delay = self.READY_CONDITIONS[name]
+        return await self.readiness.wait(name, condition, deadline, legacy_delay)
+    
+    def is_action_response(self, response, action, server_id):
+        """判断是否为按钮操作触发的面板 API 写请求响应
+        
+        start 对应 /power 请求；renew 只匹配 renew_api_path 配置的该服务器续期接口，
+        其他面板写请求不算，未匹配时由调用方回退到提示文本检查。
+        """
+        request = response.request
+        if request.method == 'GET' or request.resource_type not in ('xhr', 'fetch'):
+            return False
+        path = urlparse(response.url).path.rstrip('/')
+        if action == 'start':
+            return '/api/' in path and path.endswith('/power')
+        return path == self.renew_api_path.format(server_id=server_id).rstrip('/')
+    
+    def should_block(self, url, resource_type):
+        """light 加载配置下是否拦截该请求（CF 挑战资源始终放行）"""
+        parsed = urlparse(url)
+        host = parsed.hostname or ''
+        if host.endswith(self.CF_CHALLENGE_HOSTS) or parsed.path.startswith(self.CF_CHALLENGE_PATH):
+            return False
+        if resource_type in self.BLOCKED_RESOURCE_TYPES:
+            return True
+        return host.endswith(self.BLOCKED_HOSTS)
+    
+    async def navigate(self, page, server_id, label, url=None):
+        """按加载配置打开 url（为空时刷新当前页），并开始记录这次导航的统计
+        
+        light 配置下需要采集基线的导航临时按 full 配置加载（不拦截资源、等待网络空闲）。
+        """
+        profile = self.load_profile
+        if profile == 'light' and self.navigation.claim_sample(label):
+            profile = 'full'
+            self.log(f"📏 服务器 {server_id} 的 {label} 导航按 full 配置加载，用于采集对比基线")
+        wait_until = 'networkidle' if profile == 'full' else self.wait_until
+        phase = 'navigation_full' if profile == 'full' else 'navigation'
+        
+        self.navigation.begin(page, server_id, label, profile)
+        with self.tracer.span('goto' if url else 'reload', server_id):
+            if url:
+                await self.timed_wait(server_id, phase, lambda timeout: page.goto(
+                    url, wait_until=wait_until, timeout=timeout))
+            else:
+                await self.timed_wait(server_id, phase, lambda timeout: page.reload(
+                    wait_until=wait_until, timeout=timeout))
+        self.navigation.finish(page)
+    
+    async def timed_wait(self, server_id, phase, wait):
+        """在自适应超时内执行 wait(timeout_ms)，记录耗时（超时则记录超时值）后返回其结果"""
+        timeout = self.timeouts.timeout(server_id, phase)
+        started = time.monotonic()
+        try:
+            result = await wait(timeout)
+        except PlaywrightTimeoutError:
+            self.timeouts.observe(server_id, phase, timeout)
+            raise
+        self.timeouts.observe(server_id, phase, (time.monotonic() - started) * 1000)
+        return result
     
     def has_cookie_auth(self):
         """检查是否有 cookie 认证信息"""
@@ -67,16 +1600,16 @@ class WeirdhostAuto:
             self.log(f"检查登录状态时出错: {e}", "ERROR")
             return False
     
-    def login_with_cookies(self, context):
+    async def login_with_cookies(self, context):
         """使用 Cookies 登录"""
         try:
             self.log("尝试使用 Cookies 登录...")
             
             # 创建cookie
             session_cookie = {
-                'name': 'remember_web_59ba36addc2b2f9401580f014c7f58ea4e30989d',
+                'name': self.REMEMBER_COOKIE_NAME,
                 'value': self.remember_web_cookie,
-                'domain': 'hub.weirdhost.xyz',
+                'domain': urlparse(self.url).hostname,
                 'path': '/',
                 'expires': int(time.time()) + 3600 * 24 * 365,
                 'httpOnly': True,
@@ -84,7 +1617,7 @@ class WeirdhostAuto:
                 'sameSite': 'Lax'
             }
             
-            context.add_cookies([session_cookie])
+            await context.add_cookies([session_cookie])
             self.log("已添加 remember_web cookie")
             return True
                 
@@ -92,14 +1625,15 @@ class WeirdhostAuto:
             self.log(f"设置 Cookies 时出错: {e}", "ERROR")
             return False
     
-    def login_with_email(self, page):
+    @traced('login_email')
+    async def login_with_email(self, page):
         """使用邮箱密码登录"""
         try:
             self.log("尝试使用邮箱密码登录...")
             
             # 访问登录页面
             self.log(f"访问登录页面: {self.login_url}")
-            page.goto(self.login_url, wait_until="domcontentloaded")
+            await page.goto(self.login_url, wait_until="domcontentloaded")
             
             # 使用固定选择器
             email_selector = 'input[name="username"]'
@@ -108,21 +1642,24 @@ class WeirdhostAuto:
             
             # 等待元素加载
             self.log("等待登录表单元素加载...")
-            page.wait_for_selector(email_selector)
-            page.wait_for_selector(password_selector)
-            page.wait_for_selector(login_button_selector)
+            await page.wait_for_selector(email_selector)
+            await page.wait_for_selector(password_selector)
+            await page.wait_for_selector(login_button_selector)
             
             # 填写登录信息
             self.log("填写邮箱和密码...")
-            page.fill(email_selector, self.email)
-            time.sleep(1)  # 模拟人类输入
-            page.fill(password_selector, self.password)
-            time.sleep(1)
+            await page.fill(email_selector, self.email)
+            await asyncio.sleep(1)  # 模拟人类输入
+            await page.fill(password_selector, self.password)
+            await asyncio.sleep(1)
             
             # 点击登录并等待导航
             self.log("点击登录按钮...")
-            with page.expect_navigation(wait_until="domcontentloaded", timeout=90000):
-                page.click(login_button_selector)
+            timeout = self.timeouts.timeout('login', 'login')
+            started = time.monotonic()
+            async with page.expect_navigation(wait_until="domcontentloaded", timeout=timeout):
+                await page.click(login_button_selector)
+            self.timeouts.observe('login', 'login', (time.monotonic() - started) * 1000)
             
             # 检查登录是否成功
             if "login" in page.url or "auth" in page.url:
@@ -136,85 +1673,83 @@ class WeirdhostAuto:
             self.log(f"邮箱密码登录时出错: {e}", "ERROR")
             return False
     
-    def handle_cf_challenge(self, page, server_id):
-        """处理CF五秒盾挑战"""
+    @traced('cf_challenge')
+    async def handle_cf_challenge(self, page, server_id):
+        """处理CF五秒盾挑战
+        
+        一次页面内求值检查所有挑战标记；检测到挑战时等待挑战页面消失，而不是固定等待。
+        返回 none（无挑战）/ passed（挑战已通过）/ challenge（超时仍在挑战）/ blocked（被CF拦截）。
+        """
         try:
             self.log(f"检查服务器 {server_id} 是否遇到CF挑战...")
             
-            # 检查是否有CF挑战页面
-            cf_selectors = [
-                '#challenge-form',
-                '.challenge-form',
-                '#challenge-running',
-                '#cf-content',
-                '#challenge-stage',
-                'text=Checking your browser'
-            ]
-            
-            for selector in cf_selectors:
-                try:
-                    if page.locator(selector).is_visible(timeout=3000):
-                        self.log(f"⚠️ 服务器 {server_id} 检测到CF挑战，正在等待...")
-                        
-                        # 等待CF挑战完成（通常5-10秒）
-                        wait_time = 10
-                        self.log(f"等待 {wait_time} 秒让CF挑战完成...")
-                        time.sleep(wait_time)
-                        
-                        # 检查挑战是否完成
-                        if page.locator(selector).is_visible(timeout=3000):
-                            self.log(f"⚠️ 服务器 {server_id} CF挑战仍然存在，继续等待...")
-                            time.sleep(5)
-                        
-                        self.log(f"✅ 服务器 {server_id} CF挑战处理完成")
-                        return True
-                except:
-                    continue
+            detection = await page.evaluate(self.CF_DETECT_SCRIPT)
+            kind = detection.get('kind', 'none')
+            if kind == 'none':
+                return 'none'
             
-            # 检查是否有"Verify you are human"等文本
-            cf_texts = ["Checking your browser", "Verify", "Security Check", "Cloudflare"]
-            page_text = page.content().lower()
+            markers = ', '.join(detection.get('markers', []))
+            if kind == 'blocked':
+                self.log(f"❌ 服务器 {server_id} 被CF拦截 ({markers})", "WARNING")
+                self.note_failure(server_id, 'cf_block')
+                return 'blocked'
             
-            for text in cf_texts:
-                if text.lower() in page_text:
-                    self.log(f"⚠️ 服务器 {server_id} 检测到CF相关文本，等待挑战...")
-                    time.sleep(10)
-                    return True
+            # 等待挑战页面/挑战框架消失
+            self.log(f"⚠️ 服务器 {server_id} 检测到CF挑战 ({markers})，等待挑战完成...")
+            cleared = await self.wait_ready('cf_clear', lambda timeout: page.wait_for_function(
+                f"() => ({self.CF_DETECT_SCRIPT})().kind === 'none'", timeout=timeout))
             
-            return False
+            if cleared:
+                self.log(f"✅ 服务器 {server_id} CF挑战处理完成")
+                return 'passed'
+            self.log(f"⚠️ 服务器 {server_id} CF挑战仍然存在", "WARNING")
+            self.note_failure(server_id, 'cf_block')
+            return 'challenge'
             
         except Exception as e:
             self.log(f"检查CF挑战时出错: {e}", "WARNING")
-            return False
+            return 'none'
     
-    def wait_for_page_ready(self, page, server_id, operation="操作"):
-        """等待页面完全就绪，增加CF挑战处理"""
+    @traced('page_ready')
+    async def wait_for_page_ready(self, page, server_id, operation="操作", challenge_checked=False):
+        """等待页面完全就绪，增加CF挑战处理
+        
+        challenge_checked 表示调用方在导航后已检查过CF挑战，不再重复检查。
+        """
         self.log(f"等待服务器 {server_id} {operation}页面加载...")
         
         # 首先处理可能的CF挑战
-        self.handle_cf_challenge(page, server_id)
+        if not challenge_checked:
+            await self.handle_cf_challenge(page, server_id)
         
         # 等待主要内容区域加载
         try:
-            page.wait_for_selector('.server-details, .server-info, .card, .panel, .container, main, article', timeout=15000)
+            await self.timed_wait(server_id, 'content', lambda timeout: page.wait_for_selector(
+                '.server-details, .server-info, .card, .panel, .container, main, article', timeout=timeout))
             self.log(f"✅ 服务器 {server_id} 主要内容已加载")
         except:
             self.log(f"⚠️ 服务器 {server_id} 未找到主要内容区域")
         
-        # 等待所有图片加载完成
-        try:
-            page.wait_for_load_state('networkidle', timeout=20000)
-            self.log(f"✅ 服务器 {server_id} 网络空闲")
-        except:
-            self.log(f"⚠️ 服务器 {server_id} 网络未完全空闲")
+        # 等待所有图片加载完成（light 配置下不等待网络空闲，只等下面的按钮渲染）
+        if self.load_profile == 'full':
+            try:
+                await self.timed_wait(server_id, 'networkidle', lambda timeout: page.wait_for_load_state(
+                    'networkidle', timeout=timeout))
+                self.log(f"✅ 服务器 {server_id} 网络空闲")
+            except:
+                self.log(f"⚠️ 服务器 {server_id} 网络未完全空闲")
         
-        # 额外等待时间确保动态内容加载，特别是CF挑战后
-        time.sleep(3)
+        # 等待动态内容渲染出按钮，特别是CF挑战后
+        settled = await self.wait_ready('page_settled', lambda timeout: page.wait_for_selector(
+            'button', state='visible', timeout=timeout))
         
-        # 再次检查CF挑战
-        self.handle_cf_challenge(page, server_id)
+        # 按钮迟迟没有出现时再次检查CF挑战
+        if not settled:
+            await self.handle_cf_challenge(page, server_id)
+        self.navigation.finish(page)
     
-    def find_renew_button(self, page, server_id):
+    @traced('find_renew_button')
+    async def find_renew_button(self, page, server_id):
         """查找续期按钮 - 使用多种方法"""
         selectors = [
             'button:has-text("시간추가")',
@@ -225,30 +1760,21 @@ class WeirdhostAuto:
             'button:has-text("Add Time")',
         ]
         
-        # 先等待页面稳定
-        time.sleep(2)
+        # 先等待续期按钮挂载到页面
+        await self.wait_ready('renew_button_present', lambda timeout: page.wait_for_selector(
+            'button:has-text("시간"), button:has-text("Renew"), button:has-text("Add Time")',
+            state='attached', timeout=timeout))
         
-        for selector in selectors:
-            try:
-                if selector.startswith('//'):
-                    button = page.locator(f'xpath={selector}')
-                else:
-                    button = page.locator(selector)
-                
-                # 使用更严格的可见性检查
-                button.wait_for(state='visible', timeout=8000)
-                
-                if button.is_visible():
-                    self.log(f"✅ 服务器 {server_id} 找到续期按钮: {selector}")
-                    return button
-                    
-            except Exception as e:
-                continue
+        button = await self.find_button_by_selectors(page, server_id, 'renew', selectors)
+        if button:
+            self.log(f"✅ 服务器 {server_id} 找到续期按钮")
+            return button
         
         # 如果上述方法都失败，尝试更广泛的搜索
-        return self.find_button_alternative_methods(page, server_id, ["시간", "Renew", "Add", "추가"])
+        return await self.find_button_alternative_methods(page, server_id, ["시간", "Renew", "Add", "추가"])
     
-    def find_start_button(self, page, server_id):
+    @traced('find_start_button')
+    async def find_start_button(self, page, server_id):
         """查找启动按钮 - 完全匹配 Start"""
         selectors = [
             'button:has-text("Start")',
@@ -258,307 +1784,1135 @@ class WeirdhostAuto:
             '//button[contains(text(), "Start")]',
         ]
         
-        for selector in selectors:
-            try:
-                if selector.startswith('//'):
-                    button = page.locator(f'xpath={selector}')
-                else:
-                    button = page.locator(selector)
-                
-                # 使用更严格的可见性检查
-                button.wait_for(state='visible', timeout=8000)
-                
-                if button.is_visible():
-                    self.log(f"✅ 服务器 {server_id} 找到启动按钮: {selector}")
-                    return button
-                    
-            except Exception as e:
-                continue
+        button = await self.find_button_by_selectors(page, server_id, 'start', selectors)
+        if button:
+            self.log(f"✅ 服务器 {server_id} 找到启动按钮")
+            return button
         
         # 如果上述方法都失败，尝试更广泛的搜索
-        return self.find_button_alternative_methods(page, server_id, ["Start", "시작"], exact_match=True)
+        return await self.find_button_alternative_methods(page, server_id, ["Start", "시작"], exact_match=True)
+    
+    def selector_locator(self, page, selector):
+        """把 CSS/文本选择器或 // 开头的 XPath 转换为定位器"""
+        if selector.startswith('//'):
+            return page.locator(f'xpath={selector}')
+        return page.locator(selector)
     
-    def find_button_alternative_methods(self, page, server_id, keywords, exact_match=False):
-        """备用的按钮查找方法"""
-        # 方法1: 查找所有按钮并筛选
+    async def find_button_by_selectors(self, page, server_id, action, selectors):
+        """按选择器查找按钮：先试上次命中的选择器，未命中再让其余选择器同时竞争
+        
+        命中/未命中记录到 selector_cache，下次运行优先使用胜出的选择器。
+        """
+        site = urlparse(self.url).hostname or ''
+        ordered = self.selector_cache.ordered(site, action, selectors)
+        winner = self.selector_cache.winner(site, action)
+        
+        # 上次胜出的选择器单独快速尝试
+        if winner in ordered:
+            try:
+                button = self.selector_locator(page, winner).first
+                await button.wait_for(state='visible', timeout=self.SELECTOR_WINNER_TIMEOUT)
+                self.selector_cache.record_hit(site, action, winner)
+                self.log(f"服务器 {server_id} 缓存选择器命中: {winner}")
+                return button
+            except Exception:
+                self.selector_cache.record_miss(site, action, winner)
+                ordered = [selector for selector in ordered if selector != winner]
+        
+        if not ordered:
+            return None
+        
+        # 其余选择器合并为一个定位器同时等待，谁先可见谁胜出
+        combined = self.selector_locator(page, ordered[0])
+        for selector in ordered[1:]:
+            combined = combined.or_(self.selector_locator(page, selector))
         try:
-            all_buttons = page.locator('button')
-            button_count = all_buttons.count()
-            
-            for i in range(button_count):
-                try:
-                    button = all_buttons.nth(i)
-                    if button.is_visible():
-                        text = button.text_content().strip()
-                        
-                        if exact_match:
-                            # 完全匹配
-                            if any(keyword == text for keyword in keywords):
-                                self.log(f"✅ 服务器 {server_id} 通过文本搜索找到按钮: '{text}'")
-                                return button
-                        else:
-                            # 包含匹配
-                            if any(keyword in text for keyword in keywords):
-                                self.log(f"✅ 服务器 {server_id} 通过文本搜索找到按钮: '{text}'")
-                                return button
-                except:
-                    continue
-        except:
-            pass
+            await self.timed_wait(server_id, 'selector', lambda timeout: combined.first.wait_for(
+                state='visible', timeout=timeout))
+        except Exception:
+            return None
         
-        # 方法2: 查找特定class的按钮
-        try:
-            primary_buttons = page.locator('button.btn-primary, button.btn-success, button.btn-info, button.is-primary, .btn, .button')
-            if primary_buttons.count() > 0:
-                for i in range(primary_buttons.count()):
-                    button = primary_buttons.nth(i)
-                    if button.is_visible():
-                        text = button.text_content().strip()
-                        
-                        if exact_match:
-                            if any(keyword == text for keyword in keywords):
-                                self.log(f"✅ 服务器 {server_id} 通过class找到按钮")
-                                return button
-                        else:
-                            if any(keyword in text for keyword in keywords):
-                                self.log(f"✅ 服务器 {server_id} 通过class找到按钮")
-                                return button
-        except:
-            pass
+        # 竞争结束后一次性检查各选择器：匹配到胜出元素的记为命中，不可见的记为未命中
+        locators = [self.selector_locator(page, selector) for selector in ordered]
+        visible = await asyncio.gather(*(locator.first.is_visible() for locator in locators),
+                                       return_exceptions=True)
+        try:
+            handle = await combined.first.element_handle()
+            matched = await asyncio.gather(*(locator.evaluate_all(
+                '(elements, target) => elements.includes(target)', handle) for locator in locators),
+                return_exceptions=True)
+        except Exception:
+            # 胜出元素已从页面移除时退回到第一个可见的选择器
+            matched = visible
+        
+        found = None
+        for selector, locator, is_visible, is_match in zip(ordered, locators, visible, matched):
+            if found is None and is_match is True:
+                found = locator.first
+                self.selector_cache.record_hit(site, action, selector)
+                self.log(f"服务器 {server_id} 选择器胜出: {selector}")
+            elif is_visible is not True:
+                self.selector_cache.record_miss(site, action, selector)
+        return found
+    
+    async def scan_buttons(self, page):
+        """一次求值获取页面上所有候选按钮的快照
+        
+        返回列表，每项包含 handle（写入元素的 data-wh-handle 属性，可用于定位）、
+        text、visible、enabled 和 is_button（是否为 <button> 元素）。
+        """
+        return await page.evaluate(self.BUTTON_SCAN_SCRIPT, f"{int(time.time() * 1000):x}")
+    
+    async def find_button_alternative_methods(self, page, server_id, keywords, exact_match=False):
+        """备用的按钮查找方法：基于一次性按钮快照，在 Python 中做关键字匹配"""
+        try:
+            snapshot = await self.scan_buttons(page)
+        except Exception as e:
+            self.log(f"⚠️ 服务器 {server_id} 获取按钮快照失败: {e}")
+            return None
+        
+        def matches(text):
+            if exact_match:
+                return any(keyword == text for keyword in keywords)
+            return any(keyword in text for keyword in keywords)
+        
+        # 先匹配 <button> 元素，再匹配 .btn/.button 类元素
+        for is_button, method in ((True, "文本搜索"), (False, "class")):
+            for candidate in snapshot:
+                if candidate['is_button'] == is_button and candidate['visible'] and matches(candidate['text']):
+                    self.log(f"✅ 服务器 {server_id} 通过{method}找到按钮: '{candidate['text']}'")
+                    return page.locator(f'[data-wh-handle="{candidate["handle"]}"]')
         
         self.log(f"❌ 服务器 {server_id} 所有方法都未找到按钮")
         return None
     
-    def renew_server(self, page, server_url):
-        """续期服务器，增加CF挑战处理"""
+    async def renew_server(self, page, server_id):
+        """在已加载的服务器页面上续期，按钮始终不可用时才刷新页面重试"""
         try:
-            server_id = server_url.split('/')[-1]
             self.log(f"📅 开始续期服务器 {server_id}")
             
-            # 访问服务器页面
-            self.log(f"访问服务器页面: {server_url}")
-            page.goto(server_url, wait_until="networkidle")
-            
-            # 等待页面加载，包含CF挑战处理
-            self.wait_for_page_ready(page, server_id, "续期")
-            
             # 查找续期按钮
-            button = self.find_renew_button(page, server_id)
+            button = await self.find_renew_button(page, server_id)
             
             if not button:
                 self.log(f"❌ 服务器 {server_id} 未找到续期按钮")
                 return "no_renew_button"
             
             # 检查按钮是否被CF屏蔽
-            if not button.is_enabled():
+            if not await button.is_enabled():
                 self.log(f"⚠️ 服务器 {server_id} 续期按钮不可点击，可能被CF屏蔽，等待后重试...")
-                time.sleep(5)
                 
-                # 刷新页面重试
-                page.reload(wait_until="networkidle")
-                self.wait_for_page_ready(page, server_id, "续期重试")
-                
-                button = self.find_renew_button(page, server_id)
-                if not button or not button.is_enabled():
-                    self.log(f"❌ 服务器 {server_id} 续期按钮仍然不可点击")
-                    return "renew_button_disabled"
+                # 等待按钮变为可用，超时后才刷新页面重试
+                if not await self.wait_ready('renew_button_enabled', lambda timeout: expect(button).to_be_enabled(timeout=timeout)):
+                    await self.navigate(page, server_id, 'renew_retry')
+                    await self.wait_for_page_ready(page, server_id, "续期重试")
+                    
+                    button = await self.find_renew_button(page, server_id)
+                    if not button or not await button.is_enabled():
+                        self.log(f"❌ 服务器 {server_id} 续期按钮仍然不可点击")
+                        return "renew_button_disabled"
             
             # 点击按钮并检查结果
-            return self.click_renew_button_and_check(page, button, server_id)
+            return await self.click_renew_button_and_check(page, button, server_id)
                 
         except Exception as e:
+            if isinstance(e, PlaywrightTimeoutError):
+                self.note_failure(server_id, 'timeout')
             self.log(f"❌ 服务器 {server_id} 续期过程中出错: {e}")
             return "renew_error"
     
-    def click_renew_button_and_check(self, page, button, server_id):
+    async def click_renew_button_and_check(self, page, button, server_id):
         """点击续期按钮并检查结果"""
         try:
-            if button.is_enabled():
-                # 点击前保存页面状态用于比较
-                before_click = page.content()
-                
+            if await button.is_enabled():
                 self.log(f"✅ 服务器 {server_id} 续期按钮可点击，正在点击...")
                 
                 # 模拟人类操作：鼠标移动到按钮上
-                button.hover()
-                time.sleep(1)
-                
-                # 点击按钮
-                button.click()
-                
-                # 等待页面响应，增加等待时间处理可能的CF验证
-                time.sleep(8)
+                await button.hover()
+                self.readiness.skip('renew_hover', self.READY_CONDITIONS['renew_hover'][1])
                 
-                # 检查是否出现CF挑战
-                self.handle_cf_challenge(page, server_id)
+                # 点击按钮，拦截续期请求的响应
+                captured = {}
                 
-                # 检查页面变化
-                after_click = page.content()
+                async def click_and_wait_response(timeout):
+                    async with page.expect_response(lambda r: self.is_action_response(r, 'renew', server_id), timeout=timeout) as info:
+                        await button.click()
+                    captured['response'] = await info.value
                 
-                # 检查是否出现错误消息
-                error_patterns = [
-                    "already renewed", "can't renew", "only once", 
-                    "이미", "한번", "불가능", "already added",
-                    "failed", "error", "오류"
-                ]
+                with self.tracer.span('renew_click', server_id) as span:
+                    if not await self.wait_ready('renew_response', click_and_wait_response):
+                        span['outcome'] = 'no_response'
+                        self.log(f"⚠️ 服务器 {server_id} 未捕获到续期请求响应")
                 
-                has_error = any(pattern.lower() in after_click.lower() for pattern in error_patterns)
-                
-                if has_error:
-                    self.log(f"ℹ️ 服务器 {server_id} 检测到重复续期提示")
-                    return "already_renewed"
-                else:
-                    # 检查是否有成功消息
-                    success_patterns = ["success", "성공", "added", "추가됨", "시간이 추가", "추가되었습니다"]
-                    has_success = any(pattern.lower() in after_click.lower() for pattern in success_patterns)
-                    
-                    if has_success:
-                        self.log(f"✅ 服务器 {server_id} 续期成功")
-                        return "renew_success"
-                    else:
-                        # 检查页面内容是否发生变化
-                        if before_click != after_click:
-                            self.log(f"⚠️ 服务器 {server_id} 页面已变化但无明确结果")
-                            return "renew_unknown_changed"
-                        else:
-                            self.log(f"⚠️ 服务器 {server_id} 页面无变化")
-                            return "renew_no_change"
+                return await self.verify_renew_result(page, server_id, captured.get('response'))
             else:
                 self.log(f"❌ 服务器 {server_id} 续期按钮不可点击")
                 return "renew_button_disabled"
                 
         except Exception as e:
+            if isinstance(e, PlaywrightTimeoutError):
+                self.note_failure(server_id, 'timeout')
             self.log(f"❌ 服务器 {server_id} 点击续期按钮时出错: {e}")
             return "renew_click_error"
     
-    def start_server(self, page, server_url):
-        """启动服务器"""
+    async def read_action_response(self, response):
+        """读取拦截到的操作响应，返回 (状态码, JSON数据或None)"""
+        try:
+            data = await response.json()
+        except Exception:
+            data = None
+        return response.status, data
+    
+    async def notification_text(self, page):
+        """读取提示框（toast/alert）中的文本，最多 NOTIFICATION_TEXT_LIMIT 个字符"""
+        try:
+            return await page.evaluate(self.NOTIFICATION_TEXT_SCRIPT, self.NOTIFICATION_TEXT_LIMIT)
+        except Exception:
+            return ''
+    
+    @traced('renew_verify')
+    async def verify_renew_result(self, page, server_id, response):
+        """根据续期请求的响应判断结果，无法判断时回退到提示框文本"""
+        if response is not None:
+            status, data = await self.read_action_response(response)
+            detail = PanelApiClient.error_detail(data).lower()
+            self.observe_expiry(server_id, json.dumps(data, ensure_ascii=False) if data else '')
+            
+            if 200 <= status < 300:
+                self.log(f"✅ 服务器 {server_id} 续期成功 (HTTP {status})")
+                return "renew_success"
+            if 400 <= status < 500 and any(p.lower() in detail for p in PanelApiClient.ALREADY_RENEWED_PATTERNS):
+                self.log(f"ℹ️ 服务器 {server_id} 检测到重复续期提示 (HTTP {status})")
+                return "already_renewed"
+            if 400 <= status < 500 and status not in (403, 419, 429):
+                self.log(f"❌ 服务器 {server_id} 面板拒绝续期 (HTTP {status}): {detail[:100]}")
+                return "renew_rejected"
+            if status >= 500:
+                self.log(f"❌ 服务器 {server_id} 面板续期出错 (HTTP {status}): {detail[:100]}")
+                return "renew_error"
+            self.log(f"⚠️ 服务器 {server_id} 续期响应无法判断 (HTTP {status})，检查提示框")
+        
+        # 回退：只检查提示框内的文本
+        toast_shown = await self.wait_ready('renew_toast', lambda timeout: page.wait_for_selector(
+            self.NOTIFICATION_SELECTOR, state='visible', timeout=timeout))
+        
+        # 检查是否出现CF挑战
+        await self.handle_cf_challenge(page, server_id)
+        
+        text = (await self.notification_text(page)).lower()
+        
+        # 检查是否出现重复续期提示
+        already_patterns = [
+            "already renewed", "can't renew", "only once",
+            "이미", "한번", "불가능", "already added",
+        ]
+        if any(pattern.lower() in text for pattern in already_patterns):
+            self.log(f"ℹ️ 服务器 {server_id} 检测到重复续期提示")
+            return "already_renewed"
+        
+        # 其他错误提示视为续期失败，交给延后重试
+        error_patterns = ["failed", "error", "오류"]
+        if any(pattern in text for pattern in error_patterns):
+            self.log(f"❌ 服务器 {server_id} 续期出错: {text[:100]}")
+            return "renew_error"
+        
+        # 检查是否有成功消息
+        success_patterns = ["success", "성공", "added", "추가됨", "시간이 추가", "추가되었습니다"]
+        if any(pattern.lower() in text for pattern in success_patterns):
+            self.log(f"✅ 服务器 {server_id} 续期成功")
+            return "renew_success"
+        
+        if toast_shown:
+            self.log(f"⚠️ 服务器 {server_id} 出现提示但无明确结果")
+            return "renew_unknown_changed"
+        self.log(f"⚠️ 服务器 {server_id} 页面无变化")
+        return "renew_no_change"
+    
+    async def start_server(self, page, server_id):
+        """在续期后的同一页面上启动服务器，当前页面找不到启动按钮时才刷新一次"""
         try:
-            server_id = server_url.split('/')[-1]
             self.log(f"🚀 开始启动服务器 {server_id}")
             
-            # 刷新页面确保最新状态
-            page.reload(wait_until="networkidle")
+            # 电源状态由面板实时推送，直接在当前页面查找启动按钮
+            button = await self.find_start_button(page, server_id)
             
-            # 等待页面加载，包含CF挑战处理
-            self.wait_for_page_ready(page, server_id, "启动")
-            
-            # 查找启动按钮
-            button = self.find_start_button(page, server_id)
+            if not button:
+                self.log(f"⚠️ 服务器 {server_id} 当前页面未找到Start按钮，刷新页面重试")
+                await self.navigate(page, server_id, 'start_reload')
+                await self.wait_for_page_ready(page, server_id, "启动")
+                button = await self.find_start_button(page, server_id)
             
             if not button:
                 self.log(f"❌ 服务器 {server_id} 未找到Start按钮")
                 return "no_start_button"
             
             # 检查按钮是否被CF屏蔽
-            if not button.is_enabled():
+            if not await button.is_enabled():
                 self.log(f"⚠️ 服务器 {server_id} Start按钮不可点击，可能被CF屏蔽，等待后重试...")
-                time.sleep(5)
                 
-                # 再次查找按钮
-                button = self.find_start_button(page, server_id)
-                if not button or not button.is_enabled():
+                # 等待按钮变为可用后再次查找
+                await self.wait_ready('start_button_enabled', lambda timeout: expect(button).to_be_enabled(timeout=timeout))
+                button = await self.find_start_button(page, server_id)
+                if not button or not await button.is_enabled():
                     self.log(f"ℹ️ 服务器 {server_id} 已启动，按钮不可点击")
                     return "already_started"
             
             # 检查按钮状态并处理
-            if button.is_enabled():
+            if await button.is_enabled():
                 self.log(f"✅ 服务器 {server_id} 可以启动，正在点击...")
                 
                 # 模拟人类操作
-                button.hover()
-                time.sleep(1)
-                button.click()
+                await button.hover()
+                self.readiness.skip('start_hover', self.READY_CONDITIONS['start_hover'][1])
                 
-                # 等待操作完成
-                time.sleep(8)
+                # 点击按钮，拦截电源请求的响应
+                captured = {}
                 
-                # 检查是否出现CF挑战
-                self.handle_cf_challenge(page, server_id)
+                async def click_and_wait_response(timeout):
+                    async with page.expect_response(lambda r: self.is_action_response(r, 'start', server_id), timeout=timeout) as info:
+                        await button.click()
+                    captured['response'] = await info.value
                 
-                # 检查是否启动成功
-                # 重新查找按钮，检查是否变为不可用或其他状态
-                try:
-                    new_button = self.find_start_button(page, server_id)
-                    if new_button and not new_button.is_enabled():
-                        self.log(f"✅ 服务器 {server_id} 启动成功，按钮状态已变化")
-                        return "start_success"
-                    else:
-                        # 检查是否有成功消息
-                        page_content = page.content().lower()
-                        if "started" in page_content or "running" in page_content or "启动" in page_content or "시작" in page_content:
-                            self.log(f"✅ 服务器 {server_id} 启动成功")
-                            return "start_success"
-                        else:
-                            self.log(f"⚠️ 服务器 {server_id} 启动操作完成，但状态未知")
-                            return "start_unknown"
-                except:
-                    self.log(f"⚠️ 服务器 {server_id} 启动操作完成，无法验证状态")
-                    return "start_unknown"
+                with self.tracer.span('start_click', server_id) as span:
+                    if not await self.wait_ready('start_response', click_and_wait_response):
+                        span['outcome'] = 'no_response'
+                        self.log(f"⚠️ 服务器 {server_id} 未捕获到启动请求响应")
+                
+                return await self.verify_start_result(page, button, server_id, captured.get('response'))
             else:
                 self.log(f"ℹ️ 服务器 {server_id} 已启动，按钮不可点击")
                 return "already_started"
                 
         except Exception as e:
+            if isinstance(e, PlaywrightTimeoutError):
+                self.note_failure(server_id, 'timeout')
             self.log(f"❌ 服务器 {server_id} 启动过程中出错: {e}")
             return "start_error"
     
-    def process_server(self, page, server_url):
+    @traced('start_verify')
+    async def verify_start_result(self, page, button, server_id, response):
+        """根据电源请求的响应判断启动结果，无法判断时回退到按钮状态和提示框文本"""
+        if response is not None:
+            status, data = await self.read_action_response(response)
+            if 200 <= status < 300:
+                self.log(f"✅ 服务器 {server_id} 启动成功 (HTTP {status})")
+                return "start_success"
+            self.log(f"⚠️ 服务器 {server_id} 启动响应 HTTP {status}: "
+                     f"{PanelApiClient.error_detail(data)[:100]}，检查按钮状态")
+        
+        # 等待按钮状态翻转为不可用
+        if await self.wait_ready('start_button_disabled', lambda timeout: expect(button).to_be_disabled(timeout=timeout)):
+            self.log(f"✅ 服务器 {server_id} 启动成功，按钮状态已变化")
+            return "start_success"
+        
+        # 检查是否出现CF挑战
+        await self.handle_cf_challenge(page, server_id)
+        
+        # 检查提示框中是否有成功消息
+        text = (await self.notification_text(page)).lower()
+        if any(pattern in text for pattern in ("started", "running", "启动", "시작")):
+            self.log(f"✅ 服务器 {server_id} 启动成功")
+            return "start_success"
+        
+        self.log(f"⚠️ 服务器 {server_id} 启动操作完成，但状态未知")
+        return "start_unknown"
+    
+    def extract_expiry(self, text):
+        """从页面/接口文本中解析到期时间，返回时间戳，找不到时返回 0"""
+        for match in self.EXPIRY_PATTERN.finditer(text or ''):
+            year, month, day, hour, minute, second = match.groups()
+            try:
+                expiry = datetime(int(year), int(month), int(day),
+                                  int(hour or 0), int(minute or 0), int(second or 0),
+                                  tzinfo=self.panel_tz)
+            except ValueError:
+                continue
+            return expiry.timestamp()
+        return 0.0
+    
+    def observe_expiry(self, server_id, text):
+        """记录在面板上看到的到期时间"""
+        expiry = self.extract_expiry(text)
+        if expiry:
+            self.set_server_result(server_id, observed_expiry=expiry)
+            self.log(f"📆 服务器 {server_id} 到期时间: "
+                     f"{datetime.fromtimestamp(expiry, self.panel_tz).strftime('%Y-%m-%d %H:%M')}")
+    
+    def renew_due(self, server_id, now=None):
+        """判断服务器是否需要续期，返回 (是否需要, 原因)"""
+        now = now or time.time()
+        previous = self.state_store.latest(server_id)
+        if not previous:
+            return True, "无历史记录"
+        
+        if previous.observed_expiry and previous.observed_expiry - now <= self.renew_margin:
+            return True, "临近到期"
+        
+        if previous.last_renew_success_at:
+            next_window = previous.last_renew_success_at + self.renew_interval - self.renew_slack
+            if now < next_window:
+                hours = (next_window - now) / 3600
+                return False, f"续期窗口 {hours:.1f} 小时后开放"
+        return True, "续期窗口已开放"
+    
+    def note_failure(self, server_id, cause):
+        """记录本次尝试的失败原因提示，供延后重试分类（CF拦截优先于超时）"""
+        if self.failure_hints.get(server_id) != 'cf_block':
+            self.failure_hints[server_id] = cause
+    
+    def set_server_result(self, server_id, **values):
+        """线程安全地更新单个服务器的结果"""
+        with self.results_lock:
+            result = self.server_results.get(server_id)
+            if result is None:
+                result = ServerResult(server_id=server_id, run_id=self.run_id, account=self.account_name)
+                self.server_results[server_id] = result
+            for name, value in values.items():
+                setattr(result, name, value)
+            return result
+    
+    def begin_server_result(self, server_id, server_url, via):
+        """开始一次处理尝试：记录开始时间、尝试次数和处理方式"""
+        result = self.set_server_result(server_id, server_url=server_url)
+        with self.results_lock:
+            if not result.started_at:
+                result.started_at = time.time()
+            result.attempts += 1
+            if not result.via:
+                result.via = via
+            elif via not in result.via.split('+'):
+                result.via = f"{result.via}+{via}"
+        return result
+    
+    def finish_server_result(self, server_id):
+        """结束处理：计算耗时和最近成功时间，并追加到状态存储（每次运行只记录一次）"""
+        with self.results_lock:
+            result = self.server_results.get(server_id)
+            if result is None or server_id in self.recorded_servers:
+                return
+            self.recorded_servers.add(server_id)
+            
+            now = time.time()
+            result.finished_at = now
+            result.duration = now - (result.started_at or now)
+            
+            previous = self.state_store.latest(server_id)
+            result.last_renew_success_at = now if result.renew_status == 'renew_success' else (
+                previous.last_renew_success_at if previous else 0.0)
+            result.last_start_success_at = now if result.start_ok else (
+                previous.last_start_success_at if previous else 0.0)
+            if not result.observed_expiry and previous:
+                result.observed_expiry = previous.observed_expiry
+        
+        try:
+            self.state_store.append(result)
+        except Exception as e:
+            self.log(f"写入状态存储失败: {e}", "WARNING")
+    
+    def result_summary(self):
+        """统计本次运行结果：总数、续期成功数、启动成功数、按计划跳过数、启动未确认数"""
+        with self.results_lock:
+            results = list(self.server_results.values())
+        return {
+            'total': len(self.server_list),
+            'renew_ok': sum(1 for r in results if r.renew_ok),
+            'start_ok': sum(1 for r in results if r.start_ok),
+            'skipped': sum(1 for r in results if r.renew_status == 'renew_not_due'),
+            'dropped': sum(1 for r in results if r.renew_status == 'dropped_budget'),
+            # 启动记为 skipped 说明 API 和浏览器都没能确认服务器在运行，按失败处理
+            'start_skipped': sum(1 for r in results if r.start_status == 'skipped'),
+        }
+    
+    async def process_server(self, page, server_url):
         """处理单个服务器的续期和启动操作"""
         server_id = server_url.split('/')[-1] if server_url else "unknown"
         self.log(f"🔧 开始处理服务器 {server_id}")
         
-        # 初始化服务器结果
-        self.server_results[server_id] = {
-            'renew_status': '未执行',
-            'start_status': '未执行'
-        }
+        # 初始化服务器结果，已通过 API 或之前的尝试完成的操作直接沿用
+        done = self.completed_actions.get(server_id, {})
+        self.failure_hints.pop(server_id, None)
+        result = self.begin_server_result(server_id, server_url, 'browser')
+        self.set_server_result(server_id,
+                               renew_status=done.get('renew', '未执行'),
+                               start_status=done.get('start', '未执行'))
+        started = time.monotonic()
         
         try:
-            # 访问服务器页面
+            # 访问服务器页面：续期和启动都在这一次加载的页面上完成
             self.log(f"访问服务器页面: {server_url}")
-            page.goto(server_url, wait_until="networkidle")
+            await self.navigate(page, server_id, 'server_page', server_url)
             
             # 首先处理可能的CF挑战
-            self.handle_cf_challenge(page, server_id)
+            await self.handle_cf_challenge(page, server_id)
             
             # 检查是否已登录
             if not self.check_login_status(page):
                 self.log(f"服务器 {server_id} 未登录，尝试重新登录", "WARNING")
-                self.server_results[server_id]['renew_status'] = 'login_failed'
-                self.server_results[server_id]['start_status'] = 'login_failed'
+                self.set_server_result(server_id, renew_status='login_failed', start_status='login_failed')
+                self.finish_browser_attempt(result, started)
                 return f"{server_id}: login_failed"
             
-            # 第一步：执行续期操作
-            self.log(f"第一步：执行续期操作")
-            renew_result = self.renew_server(page, server_url)
-            self.server_results[server_id]['renew_status'] = renew_result
+            # 等待页面内容和按钮渲染
+            await self.wait_for_page_ready(page, server_id, "处理", challenge_checked=True)
             
-            # 等待一下，确保续期操作完成
-            time.sleep(5)
+            # 第一步：执行续期操作
+            if 'renew' in done:
+                renew_result = done['renew']
+                self.log(f"第一步：续期已完成 ({renew_result})，跳过")
+            else:
+                self.log(f"第一步：执行续期操作")
+                renew_result = await self.renew_server(page, server_id)
+                self.set_server_result(server_id, renew_status=renew_result)
+                self.journal.record(server_id, 'renew', renew_result, 'browser', self.run_id)
+                
+                # 等待续期触发的请求全部完成（light 配置下续期响应已在点击时拿到，无需再等）
+                if self.load_profile == 'full':
+                    await self.wait_ready('renew_settled', lambda timeout: page.wait_for_load_state('networkidle', timeout=timeout))
+                else:
+                    self.readiness.skip('renew_settled', self.READY_CONDITIONS['renew_settled'][1])
+                
+                # 记录页面上显示的到期时间，供下次运行判断是否需要续期
+                self.observe_expiry(server_id, await page.evaluate(self.EXPIRY_TEXT_SCRIPT))
             
             # 第二步：执行启动操作
-            self.log(f"第二步：执行启动操作")
-            start_result = self.start_server(page, server_url)
-            self.server_results[server_id]['start_status'] = start_result
+            if 'start' in done:
+                start_result = done['start']
+                self.log(f"第二步：启动已完成 ({start_result})，跳过")
+            else:
+                self.log(f"第二步：执行启动操作")
+                start_result = await self.start_server(page, server_id)
+                self.set_server_result(server_id, start_status=start_result)
+                self.journal.record(server_id, 'start', start_result, 'browser', self.run_id)
             
             # 返回组合结果
-            combined_result = f"renew:{renew_result},start:{start_result}"
-            self.log(f"✅ 服务器 {server_id} 处理完成: {combined_result}")
+            self.finish_browser_attempt(result, started)
+            self.log(f"✅ 服务器 {server_id} 处理完成: {result.combined}")
             
-            return f"{server_id}: {combined_result}"
+            return f"{server_id}: {result.combined}"
             
         except Exception as e:
+            if isinstance(e, PlaywrightTimeoutError):
+                self.note_failure(server_id, 'timeout')
             self.log(f"❌ 处理服务器 {server_id} 时出错: {e}", "ERROR")
-            self.server_results[server_id]['renew_status'] = 'error'
-            self.server_results[server_id]['start_status'] = 'error'
+            self.set_server_result(server_id, renew_status=done.get('renew', 'error'), start_status='error')
+            self.finish_browser_attempt(result, started)
             return f"{server_id}: error"
     
+    def finish_browser_attempt(self, result, started):
+        """记录浏览器处理耗时和各阶段耗时，并写入状态存储"""
+        result.timings['browser'] = round(time.monotonic() - started, 3)
+        for name, total in self.tracer.server_phase_totals(result.server_id).items():
+            result.timings[name] = round(total, 3)
+        self.finish_server_result(result.server_id)
+    
+    def create_api_client(self, cookies):
+        """创建面板 API 客户端并建立会话，会话不可用时返回 None"""
+        client = PanelApiClient(self.url, cookies, self.USER_AGENT, self.renew_api_path,
+                                pool_size=max(self.POWER_PROBE_WORKERS, self.concurrency))
+        try:
+            if client.bootstrap():
+                return client
+            reason = "被CF拦截" if client.blocked else "会话无效"
+            self.log(f"面板 API 不可用（{reason}），回退到浏览器", "WARNING")
+        except Exception as e:
+            self.log(f"连接面板 API 时出错: {e}，回退到浏览器", "WARNING")
+        client.close()
+        return None
+    
+    @traced('api_server')
+    def process_server_via_api(self, client, server_url, power_state=None):
+        """通过面板 API 续期并启动单个服务器
+        
+        成功的操作记入 completed_actions；面板拒绝的操作留给浏览器处理。
+        power_state 为批量探测得到的电源状态，未知时单独查询。
+        """
+        server_id = server_url.split('/')[-1]
+        done = self.completed_actions.setdefault(server_id, {})
+        result = self.begin_server_result(server_id, server_url, 'api')
+        started = time.monotonic()
+        
+        try:
+            if 'renew' not in done:
+                renew_result, data = client.renew(server_id)
+                self.observe_expiry(server_id, json.dumps(data, ensure_ascii=False) if data else '')
+                if renew_result:
+                    done['renew'] = renew_result
+                    self.journal.record(server_id, 'renew', renew_result, 'api', self.run_id)
+                    self.log(f"⚡ 服务器 {server_id} API 续期: {renew_result}")
+            
+            if 'start' not in done:
+                state = power_state or client.get_power_state(server_id)
+                if state in ('running', 'starting'):
+                    done['start'] = "already_started"
+                elif state is not None and client.send_power_signal(server_id, 'start'):
+                    done['start'] = "start_success"
+                if 'start' in done:
+                    self.journal.record(server_id, 'start', done['start'], 'api', self.run_id)
+                    self.log(f"⚡ 服务器 {server_id} API 启动: {done['start']}")
+        except Exception as e:
+            self.log(f"服务器 {server_id} API 请求出错: {e}，回退到浏览器", "WARNING")
+        
+        elapsed = time.monotonic() - started
+        result.timings['api'] = round(elapsed, 3)
+        if 'renew' in done and 'start' in done:
+            self.set_server_result(server_id, renew_status=done['renew'], start_status=done['start'])
+            self.finish_server_result(server_id)
+            self.log(f"✅ 服务器 {server_id} 已通过 API 处理完成，耗时 {elapsed * 1000:.0f}ms")
+            return f"{server_id}: {result.combined}"
+        return None
+    
+    @traced('power_probe')
+    def probe_power_states(self, client, server_urls):
+        """一次并发探测所有服务器的电源状态，返回 {server_id: 状态}
+        
+        运行中/启动中的服务器直接记为 already_started，浏览器阶段不再查找和点击 Start 按钮。
+        """
+        server_ids = [url.split('/')[-1] for url in server_urls]
+        server_ids = [server_id for server_id in server_ids
+                      if 'start' not in self.completed_actions.get(server_id, {})]
+        started = time.monotonic()
+        states = client.get_power_states(server_ids, self.POWER_PROBE_WORKERS)
+        
+        counts = {}
+        for server_id, state in states.items():
+            counts[state or 'unknown'] = counts.get(state or 'unknown', 0) + 1
+            if state in ('running', 'starting'):
+                self.completed_actions.setdefault(server_id, {})['start'] = "already_started"
+                self.journal.record(server_id, 'start', "already_started", 'api', self.run_id)
+        if states:
+            summary = ', '.join(f"{state}: {count}" for state, count in sorted(counts.items()))
+            self.log(f"🔌 电源状态探测 {len(states)} 个服务器 ({summary})，"
+                     f"耗时 {(time.monotonic() - started) * 1000:.0f}ms")
+        return states
+    
+    def process_servers_via_api(self, server_urls, cookies):
+        """API 快速通道：返回 {server_url: 结果} 中已完全处理的服务器"""
+        if self.api_mode == 'off' or not server_urls:
+            return {}
+        
+        client = self.create_api_client(cookies)
+        if not client:
+            return {}
+        self.api_session_ok = True
+        
+        self.log(f"⚡ 使用面板 API 快速通道处理 {len(server_urls)} 个服务器")
+        finished = {}
+        try:
+            states = self.probe_power_states(client, server_urls)
+            for server_url in server_urls:
+                if client.blocked:
+                    self.log("面板 API 被CF拦截，剩余服务器回退到浏览器", "WARNING")
+                    break
+                result = self.process_server_via_api(client, server_url, states.get(server_url.split('/')[-1]))
+                if result:
+                    finished[server_url] = result
+        finally:
+            client.close()
+        return finished
+    
+    def site_cookies(self, cookies):
+        """从 storage_state/context 的 cookie 列表中筛出面板域名的 cookie"""
+        host = urlparse(self.url).hostname or ''
+        return {
+            c['name']: c['value'] for c in cookies
+            if host.endswith(c.get('domain', '').lstrip('.'))
+        }
+    
+    async def save_storage_state(self, context):
+        """保存登录状态到加密缓存"""
+        try:
+            if self.state_cache.save(await context.storage_state()):
+                self.log("💾 登录状态已保存到缓存")
+        except Exception as e:
+            self.log(f"保存登录状态缓存失败: {e}", "WARNING")
+    
+    async def launch_browser(self, p):
+        """启动浏览器，增加一些参数绕过检测"""
+        return await p.chromium.launch(
+            headless=self.headless,
+            args=[
+                '--disable-blink-features=AutomationControlled',
+                '--disable-features=IsolateOrigins,site-per-process',
+                '--disable-web-security',
+                '--disable-features=site-per-process'
+            ]
+        )
+    
+    async def new_context(self, browser, storage_state=None):
+        """创建浏览器上下文，可传入已登录的 storage_state 复用登录状态"""
+        return await browser.new_context(
+            viewport={'width': 1920, 'height': 1080},
+            user_agent=self.USER_AGENT,
+            storage_state=storage_state
+        )
+    
+    async def new_page(self, context):
+        """创建页面并设置超时，light 加载配置下拦截不需要的资源"""
+        page = await context.new_page()
+        page.set_default_timeout(120000)  # 增加超时时间
+        page.set_default_navigation_timeout(120000)
+        
+        page.on('response', lambda response: self.navigation.on_response(page, response))
+        page.on('close', lambda _: self.navigation.release(page))
+        if self.load_profile == 'light':
+            async def handle_route(route):
+                request = route.request
+                # 采集基线的导航不拦截任何资源
+                if self.navigation.profile(page) != 'full' and self.should_block(request.url, request.resource_type):
+                    self.navigation.on_blocked(page, request.resource_type)
+                    await route.abort()
+                else:
+                    await route.continue_()
+            await page.route('**/*', handle_route)
+        return page
+    
+    def sample_memory(self):
+        """读取进程树内存并更新峰值，返回进程树常驻内存（字节）"""
+        tree = process_tree_rss()
+        self.memory['tree_peak'] = max(self.memory['tree_peak'], tree)
+        self.memory['python_peak'] = max(self.memory['python_peak'], process_rss())
+        return tree
+    
+    def memory_exceeded(self):
+        return bool(self.recycle_rss) and self.sample_memory() > self.recycle_rss
+    
+    async def recycle_page(self, context, page, server_id):
+        """关闭页面并在同一上下文中新建一个（登录状态保存在上下文中），新建失败时继续用旧页面"""
+        try:
+            fresh = await self.new_page(context)
+        except Exception as e:
+            self.log(f"回收页面失败: {e}", "WARNING")
+            return page
+        try:
+            await page.close()
+        except Exception:
+            pass
+        self.memory['pages_recycled'] += 1
+        self.log(f"♻️ 服务器 {server_id} 处理后回收页面")
+        return fresh
+    
+    async def recycle_context(self, session):
+        """用当前上下文的登录状态新建浏览器上下文，替换会话中的上下文和页面"""
+        old_context = session['context']
+        storage_state = await old_context.storage_state()
+        context = await self.new_context(session['browser'], storage_state=storage_state)
+        session['context'] = context
+        session['page'] = await self.new_page(context)
+        try:
+            await old_context.close()
+        except Exception:
+            pass
+        self.memory['contexts_recycled'] += 1
+        self.log(f"♻️ 浏览器上下文已回收，进程树内存 {self.sample_memory() / 1024 / 1024:.0f}MB")
+    
+    async def process_servers(self, session, server_urls, delays=None):
+        """按批处理服务器，每批 recycle_every × concurrency 个
+        
+        批次之间进程树内存仍超过 recycle_rss 时回收浏览器上下文（保留登录状态），
+        使峰值内存与服务器总数无关。delays 为 {server_url: 秒数}，对应的服务器等待该时间后
+        才开始处理（用于重试退避）。
+        """
+        batch_size = self.recycle_every * max(1, self.concurrency)
+        results = []
+        for offset in range(0, len(server_urls), batch_size):
+            if offset and self.memory_exceeded():
+                await self.recycle_context(session)
+            results.extend(await self.process_batch(session, server_urls[offset:offset + batch_size], delays))
+        return results
+    
+    async def process_batch(self, session, server_urls, delays=None):
+        """在同一个浏览器上下文中处理一批服务器，最多 concurrency 个页面同时进行
+        
+        每个服务器一个任务，由信号量限制同时运行的数量；页面放在页面池中复用，
+        同一页面两次使用之间至少间隔 SERVER_INTERVAL 秒。各页面共享上下文的
+        登录状态，一个页面等待网络时其他页面继续推进。页面处理 recycle_every 个服务器
+        或内存超过上限后被关闭并替换为新页面。
+        """
+        delays = delays or {}
+        context = session['context']
+        workers = min(self.concurrency, len(server_urls))
+        if workers > 1:
+            self.log(f"🔀 并发模式：{workers} 个页面同时处理 {len(server_urls)} 个服务器")
+        
+        semaphore = asyncio.Semaphore(workers)
+        # 页面池：(页面, 上次释放时间, 已处理服务器数)
+        pages = asyncio.Queue()
+        pages.put_nowait((session['page'], 0.0, 0))
+        for _ in range(workers - 1):
+            pages.put_nowait((await self.new_page(context), 0.0, 0))
+        
+        async def handle(server_url):
+            server_id = server_url.split('/')[-1]
+            if delays.get(server_url):
+                with self.tracer.span('retry_backoff', server_id):
+                    await asyncio.sleep(delays[server_url])
+            async with semaphore:
+                # 轮到该服务器时剩余预算已不够处理它，不再开始（重试由 retry 自己检查预算）
+                cost = self.plan_costs.pop(server_url, None)
+                if cost is not None and self.retry.remaining() < cost:
+                    return self.mark_dropped_budget(server_url, cost)
+                worker_page, released_at, served = await pages.get()
+                try:
+                    # CF 熔断打开且探测未通过时，不再访问面板
+                    if not await self.breaker_allows(worker_page):
+                        return self.mark_cf_blocked(server_url)
+                    
+                    # 在同一页面处理下一个服务器前等待一下
+                    pause = released_at + self.SERVER_INTERVAL - time.monotonic()
+                    if released_at and pause > 0:
+                        await asyncio.sleep(pause)
+                    result = await self.process_server(worker_page, server_url)
+                    self.log(f"服务器处理结果: {result}")
+                    self.record_breaker(server_id)
+                    return result
+                finally:
+                    served += 1
+                    if served >= self.recycle_every or self.memory_exceeded():
+                        worker_page, served = await self.recycle_page(context, worker_page, server_id), 0
+                    pages.put_nowait((worker_page, time.monotonic(), served))
+        
+        tasks = [
+            asyncio.create_task(handle(server_url), name=f"weirdhost-server-{server_url.split('/')[-1]}")
+            for server_url in server_urls
+        ]
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        # 保留一个页面供后续使用，其余页面关闭
+        session['page'] = pages.get_nowait()[0]
+        while not pages.empty():
+            try:
+                await pages.get_nowait()[0].close()
+            except Exception:
+                pass
+        
+        # 任务异常退出时，该服务器记为出错
+        results = []
+        for server_url, outcome in zip(server_urls, outcomes):
+            if isinstance(outcome, BaseException):
+                server_id = server_url.split('/')[-1]
+                self.log(f"服务器 {server_id} 任务出错: {outcome}", "ERROR")
+                self.set_server_result(server_id, renew_status='error', start_status='error')
+                outcome = f"{server_id}: error"
+            results.append(outcome)
+        return results
+    
+    def record_breaker(self, server_id):
+        """把服务器结果记入 CF 熔断器，熔断打开时输出提示"""
+        with self.results_lock:
+            result = self.server_results.get(server_id)
+        if result is None:
+            return
+        if self.breaker.record(CircuitBreaker.is_block_failure(result, self.failure_hints.get(server_id))):
+            self.log(f"⛔ 连续 {self.breaker.consecutive} 个服务器被CF拦截，打开熔断，"
+                     f"{self.breaker.cooldown:.0f} 秒后探测", "WARNING")
+    
+    async def breaker_allows(self, page):
+        """CF 熔断未打开时直接放行；打开时由第一个到达的任务冷却后探测，探测通过则恢复"""
+        async with self.breaker.lock:
+            if self.breaker.state == 'closed':
+                return True
+            if self.breaker.blocked:
+                return False
+            
+            # 冷却加探测（预留 30 秒）超出剩余预算时直接放弃
+            wait = self.breaker.cooldown_left()
+            if wait + 30 > self.retry.remaining():
+                self.log("⛔ 时间预算不足以等待CF熔断冷却，放弃剩余服务器", "WARNING")
+                self.breaker.give_up()
+                return False
+            with self.tracer.span('cf_breaker_cooldown'):
+                await asyncio.sleep(wait)
+            
+            if await self.probe_cf(page):
+                self.log("✅ CF熔断探测通过，恢复处理")
+                self.breaker.close()
+                return True
+            self.log("⛔ CF熔断探测仍被拦截，本次运行记为 blocked", "WARNING")
+            self.breaker.give_up()
+            return False
+    
+    @traced('cf_probe')
+    async def probe_cf(self, page):
+        """轻量探测：打开面板首页，检查是否仍有 CF 挑战以及登录状态"""
+        try:
+            await page.goto(self.url, wait_until='domcontentloaded')
+            detection = await page.evaluate(self.CF_DETECT_SCRIPT)
+        except Exception as e:
+            self.log(f"CF熔断探测出错: {e}", "WARNING")
+            return False
+        return detection.get('kind') == 'none' and self.check_login_status(page)
+    
+    def mark_cf_blocked(self, server_url):
+        """CF 熔断期间跳过的服务器：已通过 API 完成的操作保留，其余记为 cf_blocked"""
+        server_id = server_url.split('/')[-1]
+        done = self.completed_actions.get(server_id, {})
+        result = self.set_server_result(server_id, server_url=server_url,
+                                        renew_status=done.get('renew', 'cf_blocked'),
+                                        start_status=done.get('start', 'cf_blocked'))
+        self.finish_server_result(server_id)
+        self.log(f"⛔ 服务器 {server_id} 因CF熔断跳过")
+        return f"{server_id}: {result.combined}"
+    
+    async def retry_failed(self, session, server_urls):
+        """延后重试本次失败的服务器，返回 {server_url: 结果}
+        
+        每一轮把仍未成功的服务器按失败原因排队，各自退避后重新处理；已成功的续期/启动
+        记入 completed_actions 不再重复执行。重试次数用完或时间预算不足时停止。
+        """
+        results = {}
+        while True:
+            if self.breaker.blocked:
+                self.log("⛔ 本次运行被CF拦截，不再重试")
+                break
+            queued = {}
+            for url in server_urls:
+                server_id = url.split('/')[-1]
+                with self.results_lock:
+                    result = self.server_results.get(server_id)
+                if result is None or not self.retry.should_retry(result):
+                    continue
+                cause = self.retry.classify(result, self.failure_hints.get(server_id))
+                # 预估一次重试的耗时：上一次浏览器处理耗时
+                delay = self.retry.next_delay(server_id, cause, result.timings.get('browser', 60))
+                if delay is None:
+                    continue
+                
+                done = self.completed_actions.setdefault(server_id, {})
+                if result.renew_ok:
+                    done['renew'] = result.renew_status
+                if result.start_ok:
+                    done['start'] = result.start_status
+                with self.results_lock:
+                    self.recorded_servers.discard(server_id)
+                queued[url] = delay
+                self.log(f"🔁 服务器 {server_id} 失败原因 {cause}，{delay:.0f} 秒后重试 "
+                         f"(第 {self.retry.attempts[server_id]} 次，剩余预算 {self.retry.remaining():.0f} 秒)")
+            
+            if not queued:
+                break
+            urls = list(queued)
+            for url, outcome in zip(urls, await self.process_servers(session, urls, queued)):
+                result = self.server_results.get(url.split('/')[-1])
+                if result is not None and result.renew_ok and result.start_ok:
+                    self.retry.recovered += 1
+                results[url] = outcome
+        
+        if self.retry.total_retries():
+            causes = ', '.join(f"{cause}: {count}" for cause, count in sorted(self.retry.causes.items()))
+            self.log(f"🔁 延后重试 {self.retry.total_retries()} 次 ({causes})，恢复 {self.retry.recovered} 个服务器")
+        return results
+    
     def run(self):
-        """主运行函数"""
+        """主运行函数：在新的事件循环中执行 run_async"""
+        return asyncio.run(self.run_async())
+    
+    async def run_async(self):
+        """异步主流程：登录后在同一事件循环中并发处理各服务器"""
         self.log("开始 Weirdhost 自动续期和启动任务")
         
-        # 检查认证信息
+        # 预检：配置检查和续期计划都在导入 Playwright、启动浏览器之前完成
+        with self.tracer.span('preflight') as span:
+            error = self.check_config()
+            if error:
+                span['outcome'] = error
+                return [error]
+            
+            self.log(f"需要处理的服务器数量: {len(self.server_list)}")
+            for i, server_url in enumerate(self.server_list, 1):
+                self.log(f"服务器 {i}: {server_url}")
+            
+            # server_url -> 处理结果
+            results_by_url = {}
+            pending = self.resume_from_journal(self.server_list, results_by_url)
+            pending, not_due = self.schedule_pending(pending, results_by_url)
+        self.log(f"🚦 预检完成: {len(pending)} 个服务器需要处理，{len(not_due)} 个只需检查启动，"
+                 f"距脚本加载 {(time.monotonic() - MODULE_LOADED_AT) * 1000:.0f}ms")
+        
+        if not pending and not not_due:
+            self.log("⏭️ 所有服务器都无需处理")
+            return self.finalize_run(results_by_url)
+        
+        # 读取上次运行缓存的登录状态
+        cached_state, cache_reason = self.state_cache.load()
+        self.log(f"登录状态缓存: {cache_reason}")
+        
+        # 快速通道：先用缓存的会话 cookie 和 remember_web cookie 直接调用面板 API
+        api_cookies = self.site_cookies(cached_state['cookies']) if cached_state else {}
+        if self.has_cookie_auth():
+            api_cookies[self.REMEMBER_COOKIE_NAME] = self.remember_web_cookie
+        if api_cookies:
+            results_by_url.update(await asyncio.to_thread(self.process_servers_via_api,
+                                                          pending + not_due, api_cookies))
+        pending = [url for url in pending if url not in results_by_url]
+        not_due = self.unstarted(not_due)
+        
+        if not pending and not not_due:
+            self.log("⚡ 所有服务器已通过面板 API 处理完成，无需启动浏览器")
+            return self.finalize_run(results_by_url)
+        
+        try:
+            with self.tracer.span('playwright_import'):
+                load_playwright()
+            async with async_playwright() as p:
+                session = await self.open_browser_session(p, cached_state)
+                
+                # 如果登录成功，处理剩余的每个服务器
+                if session['login_success']:
+                    await self.process_with_browser(session, pending, results_by_url, not_due)
+                else:
+                    self.log("❌ 所有登录方式都失败了", "ERROR")
+                    self.mark_login_failed(pending, results_by_url)
+                
+                await session['browser'].close()
+            
+            return self.finalize_run(results_by_url)
+                
+        except PlaywrightTimeoutError as e:
+            self.log(f"操作超时: {e}", "ERROR")
+            return self.finalize_run(results_by_url, "error: timeout")
+        except Exception as e:
+            self.log(f"运行时出错: {e}", "ERROR")
+            return self.finalize_run(results_by_url, "error: runtime")
+    
+    def run_daemon(self):
+        """守护模式入口：在新的事件循环中执行 run_daemon_async，直到收到 SIGINT/SIGTERM"""
+        return asyncio.run(self.run_daemon_async())
+    
+    async def run_daemon_async(self):
+        """守护模式主循环：保持一个已登录的浏览器，按各服务器的周期处理到期的服务器
+        
+        每个服务器处理完后在 daemon_interval ± daemon_jitter 之后再次到期；续期计划
+        （renew_due）照常生效，未到续期时间的服务器只通过 API 检查启动，不做浏览器操作。
+        """
+        self.log(f"🛰️ 守护模式启动：周期 {self.daemon_interval / 60:.0f} 分钟，"
+                 f"抖动 ±{self.daemon_jitter / 60:.0f} 分钟，内存上限 {self.daemon_max_rss / 1024 / 1024:.0f}MB")
+        
+        error = self.check_config()
+        if error:
+            return [error]
+        
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        
+        with self.tracer.span('playwright_import'):
+            load_playwright()
+        jitter = random.Random()
+        # server_url -> 下次到期的时间戳，启动时全部立即到期
+        next_run = {url: 0.0 for url in self.server_list}
+        session = None
+        results = []
+        
+        async with async_playwright() as p:
+            while not stop.is_set():
+                due = [url for url in self.server_list if next_run[url] <= time.time()]
+                if due:
+                    try:
+                        if not self.session_healthy(session):
+                            await self.close_browser_session(session)
+                            session = await self.open_daemon_session(p)
+                        results = await self.run_cycle(session, due)
+                    except Exception as e:
+                        self.log(f"守护模式本轮处理出错: {e}，重启浏览器", "ERROR")
+                        await self.close_browser_session(session)
+                        session = None
+                    for url in due:
+                        next_run[url] = time.time() + max(
+                            60.0, self.daemon_interval + jitter.uniform(-self.daemon_jitter, self.daemon_jitter))
+                
+                wait = max(1.0, min(next_run.values()) - time.time())
+                self.log(f"💤 下一次处理在 {wait / 60:.1f} 分钟后")
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+            
+            self.log("🛰️ 收到退出信号，关闭浏览器")
+            await self.close_browser_session(session)
+        return results
+    
+    def session_healthy(self, session):
+        """常驻浏览器是否可以继续使用：已登录、未崩溃且进程树内存未超过上限"""
+        if session is None or not session['login_success']:
+            return False
+        if not session['browser'].is_connected():
+            self.log("⚠️ 浏览器已断开（可能崩溃），重启浏览器", "WARNING")
+            return False
+        rss = process_tree_rss()
+        if self.daemon_max_rss and rss > self.daemon_max_rss:
+            self.log(f"⚠️ 进程树内存 {rss / 1024 / 1024:.0f}MB 超过上限，重启浏览器", "WARNING")
+            return False
+        return True
+    
+    async def open_daemon_session(self, p):
+        """启动浏览器并登录（优先复用缓存的登录状态），返回会话字典"""
+        cached_state, cache_reason = self.state_cache.load()
+        self.log(f"登录状态缓存: {cache_reason}")
+        session = await self.open_browser_session(p, cached_state)
+        self.log(f"🛰️ 浏览器已启动，进程树内存 {process_tree_rss() / 1024 / 1024:.0f}MB")
+        return session
+    
+    async def close_browser_session(self, session):
+        """关闭会话的浏览器，浏览器已崩溃时忽略错误"""
+        if session is None:
+            return
+        try:
+            await session['browser'].close()
+        except Exception:
+            pass
+    
+    def reset_cycle(self):
+        """守护模式：开始新一轮前清空上一轮的结果和统计，常驻进程的内存不随轮数增长"""
+        self.run_id = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        with self.results_lock:
+            self.server_results = {}
+            self.recorded_servers = set()
+        self.completed_actions = {}
+        self.plan_costs = {}
+        self.api_session_ok = False
+        self.failure_hints = {}
+        self.retry = RetryScheduler(self.time_budget)
+        self.breaker = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+        self.timeouts.adjusted = {}
+        self.readiness = ReadinessTracker()
+        self.navigation = NavigationStats(os.path.join(self.cache_dir, 'navigation_baseline.json'),
+                                          self.baseline_sample_hours)
+        self.tracer = RunTracer()
+    
+    async def run_cycle(self, session, due):
+        """守护模式的一轮：处理到期的服务器，其余服务器沿用状态存储中的最近结果"""
+        self.reset_cycle()
+        self.log(f"🛰️ 本轮到期服务器: {len(due)}/{len(self.server_list)}")
+        
+        results_by_url = {}
+        pending, not_due = self.schedule_pending(due, results_by_url)
+        if (pending or not_due) and session['login_success']:
+            await self.process_with_browser(session, pending, results_by_url, not_due)
+        elif pending:
+            self.log("❌ 所有登录方式都失败了", "ERROR")
+            self.mark_login_failed(pending, results_by_url)
+        
+        for url in self.server_list:
+            server_id = url.split('/')[-1]
+            latest = self.state_store.latest(server_id)
+            if url in due or latest is None:
+                continue
+            with self.results_lock:
+                self.server_results[server_id] = ServerResult.from_dict(latest.to_dict())
+                self.recorded_servers.add(server_id)
+        
+        results = self.finalize_run(results_by_url, server_urls=due)
+        # 多账户时各账户进程共用工作目录，README 只在单账户守护模式下更新
+        if not self.account_name:
+            self.write_readme_file(results)
+        return results
+    
+    def check_config(self):
+        """检查认证信息和服务器列表，有问题时返回错误结果"""
         has_cookie = self.has_cookie_auth()
         has_email = self.has_email_auth()
         
@@ -567,97 +2921,418 @@ class WeirdhostAuto:
         
         if not has_cookie and not has_email:
             self.log("没有可用的认证信息！", "ERROR")
-            return ["error: no_auth"]
+            return "error: no_auth"
         
         # 检查服务器URL列表
         if not self.server_list:
             self.log("未设置服务器URL列表！请设置 WEIRDHOST_SERVER_URLS 环境变量", "ERROR")
-            return ["error: no_servers"]
+            return "error: no_servers"
+        return None
+    
+    def resume_from_journal(self, server_urls, results_by_url):
+        """读取上次中断运行的检查点：成功的步骤记入 completed_actions 不再重复，
+        两步都已成功的服务器直接沿用结果，返回仍需处理的服务器"""
+        entries = self.journal.load()
+        if not entries:
+            return list(server_urls)
         
-        self.log(f"需要处理的服务器数量: {len(self.server_list)}")
-        for i, server_url in enumerate(self.server_list, 1):
-            self.log(f"服务器 {i}: {server_url}")
+        for url in server_urls:
+            server_id = url.split('/')[-1]
+            entry = entries.get(server_id)
+            if not entry:
+                continue
+            done = {step: entry[step] for step, ok in (('renew', ServerResult.RENEW_OK), ('start', ServerResult.START_OK))
+                    if entry.get(step) in ok}
+            if not done:
+                continue
+            self.completed_actions.setdefault(server_id, {}).update(done)
+            self.resumed += 1
+            if 'renew' in done and 'start' in done:
+                self.set_server_result(server_id, server_url=url, via=entry.get('via', ''),
+                                       renew_status=done['renew'], start_status=done['start'])
+                # 中断的运行已写入状态存储时不再重复追加
+                latest = self.state_store.latest(server_id)
+                if latest and latest.run_id == entry.get('run_id'):
+                    with self.results_lock:
+                        self.recorded_servers.add(server_id)
+                self.finish_server_result(server_id)
+                results_by_url[url] = f"{server_id}: renew:{done['renew']},start:{done['start']}"
+            self.log(f"♻️ 服务器 {server_id} 从检查点恢复: {', '.join(f'{k}={v}' for k, v in done.items())}")
         
-        results = []
+        if self.resumed:
+            self.log(f"♻️ 上次运行中断，从检查点恢复 {self.resumed} 个服务器的进度")
+        return [url for url in server_urls if url not in results_by_url]
+    
+    def schedule_pending(self, server_urls, results_by_url):
+        """续期计划：未到续期时间的服务器跳过续期，返回 (需要处理的服务器, 只需处理启动的服务器)
         
-        try:
-            with sync_playwright() as p:
-                # 启动浏览器，增加一些参数绕过检测
-                browser = p.chromium.launch(
-                    headless=self.headless,
-                    args=[
-                        '--disable-blink-features=AutomationControlled',
-                        '--disable-features=IsolateOrigins,site-per-process',
-                        '--disable-web-security',
-                        '--disable-features=site-per-process'
-                    ]
-                )
+        未到期的服务器仍要保证运行：启动只通过面板 API 电源探测处理，不为它们启动浏览器；
+        API 不可用时启动记为 skipped。
+        """
+        not_due = []
+        for url in server_urls:
+            server_id = url.split('/')[-1]
+            due, reason = self.renew_due(server_id) if self.schedule_enabled else (True, "")
+            if not due:
+                self.log(f"⏭️ 服务器 {server_id} 跳过续期: {reason}")
+                self.completed_actions.setdefault(server_id, {})['renew'] = 'renew_not_due'
+                self.set_server_result(server_id, server_url=url, via='schedule',
+                                       renew_status='renew_not_due', start_status='skipped')
+                results_by_url[url] = f"{server_id}: renew_not_due"
+                if 'start' not in self.completed_actions[server_id]:
+                    not_due.append(url)
+        return [url for url in server_urls if url not in results_by_url], not_due
+    
+    def unstarted(self, server_urls):
+        """筛出启动步骤尚未完成的服务器"""
+        return [url for url in server_urls
+                if 'start' not in self.completed_actions.get(url.split('/')[-1], {})]
+    
+    def plan_pending(self, server_urls):
+        """按到期时间排序并记录每个服务器的预估耗时，派发时由 process_batch 对照剩余预算"""
+        if not server_urls:
+            return server_urls
+        budget = self.retry.remaining()
+        planned, estimates = self.planner.plan(server_urls)
+        self.plan_costs.update((url, cost) for url, (_, cost) in estimates.items())
+        
+        total = sum(cost for _, cost in estimates.values()) / max(1, self.concurrency)
+        self.log(f"🗺️ 执行计划: {len(planned)} 个服务器，预估 {total:.0f}s / 剩余预算 {budget:.0f}s")
+        for index, url in enumerate(planned, 1):
+            deadline, cost = estimates[url]
+            when = datetime.fromtimestamp(deadline, self.panel_tz).strftime('%Y-%m-%d %H:%M') if deadline else "未知"
+            self.log(f"  {index}. {url.split('/')[-1]} 到期 {when}，预估 {cost:.0f}s")
+        if total > budget:
+            self.log("⏳ 预估耗时超出剩余预算，排在后面的服务器开始前预算不足时将跳过", "WARNING")
+        return planned
+    
+    def mark_dropped_budget(self, server_url, cost):
+        """派发时剩余预算不足以处理的服务器：已完成的操作保留，其余记为 dropped_budget"""
+        server_id = server_url.split('/')[-1]
+        done = self.completed_actions.get(server_id, {})
+        result = self.set_server_result(server_id, server_url=server_url, via='plan',
+                                        renew_status=done.get('renew', 'dropped_budget'),
+                                        start_status=done.get('start', 'dropped_budget'))
+        self.finish_server_result(server_id)
+        self.log(f"⏳ 服务器 {server_id} 剩余预算 {self.retry.remaining():.0f}s 不足 (预估 {cost:.0f}s)，"
+                 f"本次不处理", "WARNING")
+        return f"{server_id}: {result.combined}"
+    
+    def mark_login_failed(self, server_urls, results_by_url):
+        """登录失败：剩余服务器全部记为 login_failed"""
+        results_by_url.update((url, "login_failed") for url in server_urls)
+        for url in server_urls:
+            self.set_server_result(url.split('/')[-1], server_url=url,
+                                   renew_status='login_failed', start_status='login_failed')
+    
+    async def open_browser_session(self, p, cached_state=None):
+        """启动浏览器并登录，返回会话字典 {browser, context, page, login_success}
+        
+        上下文和页面在处理过程中可能被回收替换，调用方始终通过会话字典访问。
+        
+        依次尝试缓存的登录状态、Cookie 登录和邮箱密码登录，登录成功后保存登录状态。
+        """
+        has_cookie = self.has_cookie_auth()
+        has_email = self.has_email_auth()
+        
+        # 启动浏览器
+        browser = await self.launch_browser(p)
+        
+        # 创建浏览器上下文（有缓存时直接载入登录状态）
+        context = await self.new_context(browser, storage_state=cached_state)
+        
+        # 创建页面
+        page = await self.new_page(context)
+        
+        login_success = False
+        login_span = self.tracer.begin('login')
+        
+        # 方案0: 复用缓存的登录状态，有效时跳过登录
+        if cached_state:
+            self.log("检查缓存的登录状态...")
+            with self.tracer.span('goto', '登录检查'):
+                await page.goto(self.url, wait_until="domcontentloaded")
+            
+            # 处理可能的CF挑战
+            await self.handle_cf_challenge(page, "登录检查")
+            
+            if self.check_login_status(page):
+                self.log("✅ 缓存的登录状态有效，跳过登录！")
+                login_success = True
+            else:
+                self.log("缓存的登录状态已失效，重新登录", "WARNING")
+                self.state_cache.invalidate()
+                await context.close()
+                context = await self.new_context(browser)
+                page = await self.new_page(context)
+        
+        # 方案1: 尝试 Cookie 登录
+        if not login_success and has_cookie:
+            if await self.login_with_cookies(context):
+                # 访问任意页面检查登录状态
+                self.log("检查Cookie登录状态...")
+                with self.tracer.span('goto', '登录检查'):
+                    await page.goto(self.url, wait_until="domcontentloaded")
                 
-                # 创建浏览器上下文
-                context = browser.new_context(
-                    viewport={'width': 1920, 'height': 1080},
-                    user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                )
+                # 处理可能的CF挑战
+                await self.handle_cf_challenge(page, "登录检查")
                 
-                # 创建页面
-                page = context.new_page()
-                page.set_default_timeout(120000)  # 增加超时时间
-                page.set_default_navigation_timeout(120000)
-                
-                login_success = False
-                
-                # 方案1: 尝试 Cookie 登录
-                if has_cookie:
-                    if self.login_with_cookies(context):
-                        # 访问任意页面检查登录状态
-                        self.log("检查Cookie登录状态...")
-                        page.goto(self.url, wait_until="domcontentloaded")
-                        
-                        # 处理可能的CF挑战
-                        self.handle_cf_challenge(page, "登录检查")
-                        
-                        if self.check_login_status(page):
-                            self.log("✅ Cookie 登录成功！")
-                            login_success = True
-                        else:
-                            self.log("Cookie 登录失败，cookies 可能已过期", "WARNING")
-                
-                # 方案2: 如果 Cookie 登录失败，尝试邮箱密码登录
-                if not login_success and has_email:
-                    if self.login_with_email(page):
-                        # 登录成功后访问首页
-                        self.log("检查邮箱密码登录状态...")
-                        page.goto(self.url, wait_until="domcontentloaded")
-                        
-                        # 处理可能的CF挑战
-                        self.handle_cf_challenge(page, "登录检查")
-                        
-                        if self.check_login_status(page):
-                            self.log("✅ 邮箱密码登录成功！")
-                            login_success = True
-                
-                # 如果登录成功，依次处理每个服务器
-                if login_success:
-                    for server_url in self.server_list:
-                        result = self.process_server(page, server_url)
-                        results.append(result)
-                        self.log(f"服务器处理结果: {result}")
-                        
-                        # 在处理下一个服务器前等待一下
-                        time.sleep(8)
+                if self.check_login_status(page):
+                    self.log("✅ Cookie 登录成功！")
+                    login_success = True
                 else:
-                    self.log("❌ 所有登录方式都失败了", "ERROR")
-                    results = ["login_failed"] * len(self.server_list)
+                    self.log("Cookie 登录失败，cookies 可能已过期", "WARNING")
+        
+        # 方案2: 如果 Cookie 登录失败，尝试邮箱密码登录
+        if not login_success and has_email:
+            if await self.login_with_email(page):
+                # 登录成功后访问首页
+                self.log("检查邮箱密码登录状态...")
+                with self.tracer.span('goto', '登录检查'):
+                    await page.goto(self.url, wait_until="domcontentloaded")
                 
-                browser.close()
-                return results
+                # 处理可能的CF挑战
+                await self.handle_cf_challenge(page, "登录检查")
                 
-        except TimeoutError as e:
-            self.log(f"操作超时: {e}", "ERROR")
-            return ["error: timeout"] * len(self.server_list)
+                if self.check_login_status(page):
+                    self.log("✅ 邮箱密码登录成功！")
+                    login_success = True
+        
+        self.tracer.end(login_span, 'ok' if login_success else 'fail')
+        if login_success:
+            await self.save_storage_state(context)
+        return {'browser': browser, 'context': context, 'page': page, 'login_success': login_success}
+    
+    async def process_with_browser(self, session, pending, results_by_url, not_due=()):
+        """在已登录的浏览器上下文中处理剩余服务器：先用浏览器 cookie 再试一次 API，其余交给页面
+        
+        not_due 为未到续期时间、只需处理启动的服务器，API 无法确认启动时同样交给页面处理
+        （续期步骤已记入 completed_actions，页面上只执行启动）。
+        """
+        # 浏览器登录后（含 cf_clearance 等 cookie）再尝试一次 API 快速通道
+        if not self.api_session_ok:
+            browser_cookies = self.site_cookies(await session['context'].cookies(self.url))
+            results_by_url.update(await asyncio.to_thread(self.process_servers_via_api,
+                                                          pending + list(not_due), browser_cookies))
+            pending = [url for url in pending if url not in results_by_url]
+        
+        # 只有留给浏览器的服务器按到期时间排序并裁剪到剩余预算（API 处理的服务器几乎不占时间）
+        pending = self.plan_pending(pending) + self.unstarted(not_due)
+        if pending:
+            results_by_url.update(zip(pending, await self.process_servers(session, pending)))
+            results_by_url.update(await self.retry_failed(session, pending))
+            # 保存处理过程中刷新过的 cookie
+            await self.save_storage_state(session['context'])
+    
+    def finalize_run(self, results_by_url, default="error: runtime", server_urls=None):
+        """收尾：未处理的服务器记为出错，所有结果写入状态存储，返回按配置顺序排列的结果
+        
+        server_urls 为本次负责的服务器（默认全部），守护模式下每轮只收尾到期的服务器。
+        """
+        server_urls = self.server_list if server_urls is None else server_urls
+        # 所有服务器都有结果时运行完整结束，删除检查点；否则保留供下次运行恢复
+        if all(url in results_by_url for url in server_urls):
+            self.journal.clear()
+        results = []
+        for url in server_urls:
+            server_id = url.split('/')[-1]
+            if url not in results_by_url:
+                results_by_url[url] = default
+                if server_id not in self.server_results:
+                    self.set_server_result(server_id, server_url=url, renew_status='error', start_status='error')
+            self.finish_server_result(server_id)
+            results.append(results_by_url[url])
+        self.report_readiness()
+        self.report_navigation()
+        self.report_trace()
+        self.report_memory()
+        self.report_timeouts()
+        for key, (hits, misses) in self.selector_cache.stats().items():
+            self.log(f"🎯 选择器缓存 {key}: 命中 {hits} 次, 未命中 {misses} 次")
+        try:
+            self.selector_cache.save()
+        except OSError as e:
+            self.log(f"保存选择器缓存失败: {e}", "WARNING")
+        return results
+    
+    def report_trace(self):
+        """输出各阶段 p50/p95 汇总表并导出追踪文件"""
+        lines = self.tracer.summary_lines()
+        if not lines:
+            return
+        self.log("📊 阶段耗时汇总:")
+        for line in lines:
+            self.log(f"  {line}")
+        try:
+            self.tracer.export(self.trace_dir)
+            self.log(f"📊 追踪文件已导出到 {self.trace_dir}/ (trace.json, trace.chrome.json 可用 Perfetto 打开)")
         except Exception as e:
-            self.log(f"运行时出错: {e}", "ERROR")
-            return ["error: runtime"] * len(self.server_list)
+            self.log(f"导出追踪文件失败: {e}", "WARNING")
+    
+    def report_timeouts(self):
+        """输出本次调整过的超时，并保存耗时样本"""
+        lines = self.timeouts.summary_lines()
+        if lines:
+            self.log(f"⏱️ 自适应超时调整了 {len(lines)} 项:")
+            for line in lines:
+                self.log(f"  {line}")
+        try:
+            self.timeouts.save()
+        except OSError as e:
+            self.log(f"保存耗时样本失败: {e}", "WARNING")
+    
+    def report_memory(self):
+        """输出进程树/Python 内存峰值和页面、上下文回收次数"""
+        self.sample_memory()
+        m = self.memory
+        self.log(f"🧠 内存峰值: 进程树 {m['tree_peak'] / 1024 / 1024:.0f}MB, Python {m['python_peak'] / 1024 / 1024:.0f}MB; "
+                 f"回收页面 {m['pages_recycled']} 次, 上下文 {m['contexts_recycled']} 次")
+    
+    def report_navigation(self):
+        """用 full 配置的导航更新基线，并输出每类导航的加载统计（本次采集的基线立即参与对比）"""
+        if not self.navigation.records:
+            return
+        try:
+            self.navigation.save()
+        except OSError as e:
+            self.log(f"保存导航基线失败: {e}", "WARNING")
+        self.log(f"🪶 页面加载统计 (加载配置: {self.load_profile}):")
+        for line in self.navigation.summary_lines():
+            self.log(f"  {line}")
+    
+    def report_readiness(self):
+        """输出就绪等待统计，以及相对旧版固定等待节省的时间"""
+        lines = self.readiness.summary_lines()
+        if not lines:
+            return
+        self.log("⏱️ 就绪等待统计:")
+        for line in lines:
+            self.log(f"  {line}")
+        self.log(f"⏱️ 相对固定等待共节省 {self.readiness.total_saved():.1f} 秒")
+    
+    def account_report(self, results):
+        """汇总本账户的运行结果，返回可跨进程传递的字典"""
+        with self.results_lock:
+            server_results = {server_id: r.to_dict() for server_id, r in self.server_results.items()}
+        with self.tracer.lock:
+            spans = list(self.tracer.spans)
+        with self.readiness.lock:
+            readiness = {name: dict(stat) for name, stat in self.readiness.stats.items()}
+        return {
+            'name': self.account_name,
+            'server_list': list(self.server_list),
+            'results': list(results),
+            'server_results': server_results,
+            'spans': spans,
+            'trace_origin': self.tracer.wall_origin,
+            'readiness': readiness,
+            'navigation': [dict(r) for r in self.navigation.records],
+            'retry': {'attempts': dict(self.retry.attempts), 'causes': dict(self.retry.causes),
+                      'recovered': self.retry.recovered},
+            'memory': dict(self.memory),
+            'breaker': {'trips': self.breaker.trips, 'state': self.breaker.state},
+            'resumed': self.resumed,
+            'timeouts': {f"{self.account_name}:{key}": value for key, value in self.timeouts.adjusted.items()},
+        }
+    
+    def failed_account_report(self, account):
+        """账户进程异常退出时，为该账户的所有服务器生成出错报告"""
+        server_results = {}
+        for url in account['servers']:
+            server_id = url.split('/')[-1]
+            server_results[server_id] = ServerResult(
+                server_id=server_id, server_url=url, run_id=self.run_id, account=account['name'],
+                renew_status='error', start_status='error').to_dict()
+        return {
+            'name': account['name'],
+            'server_list': list(account['servers']),
+            'results': [f"{url.split('/')[-1]}: error" for url in account['servers']] or ["error: runtime"],
+            'server_results': server_results,
+            'spans': [],
+            'trace_origin': self.tracer.wall_origin,
+            'readiness': {},
+            'navigation': [],
+            'retry': {'attempts': {}, 'causes': {}, 'recovered': 0},
+            'memory': {},
+            'breaker': {'trips': 0, 'state': 'closed'},
+            'resumed': 0,
+            'timeouts': {},
+        }
+    
+    def merge_account_report(self, report):
+        """把单个账户的报告合并到本实例，用于生成统一的汇总和 README"""
+        self.server_list.extend(report['server_list'])
+        with self.results_lock:
+            for server_id, data in report['server_results'].items():
+                self.server_results[server_id] = ServerResult.from_dict(data)
+            # 账户在处理服务器前就失败（如缺少认证信息）时，用账户级错误填充其服务器
+            status = report['results'][0] if report['results'] else "error: runtime"
+            for url in report['server_list']:
+                server_id = url.split('/')[-1]
+                if server_id not in self.server_results:
+                    self.server_results[server_id] = ServerResult(
+                        server_id=server_id, server_url=url, run_id=self.run_id, account=report['name'],
+                        renew_status=status, start_status=status)
+        
+        # 追踪时间轴对齐到本实例的起点，每个账户单独成轨道
+        shift = report['trace_origin'] - self.tracer.wall_origin
+        with self.tracer.lock:
+            for span in report['spans']:
+                self.tracer.spans.append(dict(span, start=span['start'] + shift,
+                                              thread=f"{report['name']}/{span['thread']}"))
+        with self.readiness.lock:
+            for name, stat in report['readiness'].items():
+                merged = self.readiness.stats.setdefault(name, {
+                    'count': 0, 'fired': 0, 'waited': 0.0, 'legacy': 0.0
+                })
+                for key in merged:
+                    merged[key] += stat.get(key, 0)
+        with self.navigation.lock:
+            self.navigation.records.extend(report['navigation'])
+        self.retry.attempts.update(report['retry']['attempts'])
+        for cause, count in report['retry']['causes'].items():
+            self.retry.causes[cause] = self.retry.causes.get(cause, 0) + count
+        self.retry.recovered += report['retry']['recovered']
+        self.breaker.trips += report['breaker']['trips']
+        self.resumed += report['resumed']
+        self.timeouts.adjusted.update(report['timeouts'])
+        if report['breaker']['state'] == 'blocked':
+            self.breaker.give_up()
+        # 各账户在独立进程中运行，峰值取最大、回收次数累加
+        for key, value in report['memory'].items():
+            self.memory[key] = max(self.memory[key], value) if key.endswith('_peak') else self.memory[key] + value
+        return report['results']
+    
+    def run_accounts(self, accounts):
+        """多账户模式：每个账户在独立进程中运行（各自的浏览器和上下文），结果合并
+        
+        单个账户失败（包括进程崩溃）只影响该账户自己的服务器。
+        """
+        # 父实例只汇总各账户的服务器，忽略 WEIRDHOST_SERVER_URLS，避免统计总数虚高
+        self.server_urls = ''
+        self.server_list = []
+        
+        workers = min(self.account_workers, len(accounts))
+        self.log(f"👥 多账户模式：{len(accounts)} 个账户，{workers} 个进程并行")
+        
+        reports = {}
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = {account['name']: (account, pool.submit(run_account, account)) for account in accounts}
+            for name, (account, future) in futures.items():
+                try:
+                    reports[name] = future.result()
+                except Exception as e:
+                    self.log(f"账户 {name} 运行失败: {e}", "ERROR")
+                    reports[name] = self.failed_account_report(account)
+        
+        results = []
+        for account in accounts:
+            results.extend(self.merge_account_report(reports[account['name']]))
+        self.report_readiness()
+        self.report_navigation()
+        self.report_trace()
+        self.report_memory()
+        return results
     
     def write_readme_file(self, results):
         """写入README文件"""
@@ -677,6 +3352,7 @@ class WeirdhostAuto:
                 "renew_no_change": "⚠️ 续期页面无变化",
                 "renew_click_error": "💥 点击续期按钮出错",
                 "renew_error": "💥 续期过程出错",
+                "renew_rejected": "❌ 面板拒绝续期",
                 
                 # 启动状态
                 "start_success": "✅ 启动成功",
@@ -685,6 +3361,12 @@ class WeirdhostAuto:
                 "start_unknown": "⚠️ 启动完成但状态未知",
                 "start_error": "💥 启动过程出错",
                 
+                # 计划跳过
+                "renew_not_due": "⏭️ 未到续期时间",
+                "skipped": "⏭️ 跳过",
+                "dropped_budget": "⏳ 超出时间预算未处理",
+                "cf_blocked": "⛔ CF熔断，未处理",
+                
                 # 通用状态
                 "login_failed": "❌ 登录失败",
                 "error": "💥 运行出错",
@@ -706,15 +3388,21 @@ class WeirdhostAuto:
 
 ## 运行结果
 
-| 服务器ID | 续期状态 | 启动状态 |
-|----------|----------|----------|
 """
             
+            # 多账户模式下增加账户列
+            show_account = any(result.account for result in self.server_results.values())
+            if show_account:
+                readme_content += "| 账户 | 服务器ID | 续期状态 | 启动状态 |\n|------|----------|----------|----------|\n"
+            else:
+                readme_content += "| 服务器ID | 续期状态 | 启动状态 |\n|----------|----------|----------|\n"
+            
             # 添加每个服务器的结果表格
-            for server_id, status in self.server_results.items():
-                renew_msg = status_messages.get(status['renew_status'], f"❓ {status['renew_status']}")
-                start_msg = status_messages.get(status['start_status'], f"❓ {status['start_status']}")
-                readme_content += f"| `{server_id}` | {renew_msg} | {start_msg} |\n"
+            for server_id, result in self.server_results.items():
+                renew_msg = status_messages.get(result.renew_status, f"❓ {result.renew_status}")
+                start_msg = status_messages.get(result.start_status, f"❓ {result.start_status}")
+                account_cell = f"{result.account} | " if show_account else ""
+                readme_content += f"| {account_cell}`{server_id}` | {renew_msg} | {start_msg} |\n"
             
             # 如果没有服务器结果，显示错误信息
             if not self.server_results:
@@ -730,11 +3418,16 @@ class WeirdhostAuto:
                         readme_content += f"| 未知 | {status_msg} | N/A |\n"
             
             # 添加统计信息
-            total_servers = len(self.server_list)
-            successful_renews = sum(1 for s in self.server_results.values() 
-                                  if s['renew_status'] in ['renew_success', 'already_renewed'])
-            successful_starts = sum(1 for s in self.server_results.values() 
-                                  if s['start_status'] in ['start_success', 'already_started'])
+            phase_table = '\n'.join(self.tracer.summary_lines()) or '无'
+            summary = self.result_summary()
+            navigations, blocked, saved_seconds, saved_bytes = self.navigation.totals()
+            if saved_seconds is not None:
+                navigation_saved = f"相对基线节省 {saved_seconds:.1f} 秒 / {saved_bytes / 1024:.0f} KB"
+            else:
+                navigation_saved = "相对基线节省不可用（没有 full 配置基线）"
+            total_servers = summary['total']
+            successful_renews = summary['renew_ok']
+            successful_starts = summary['start_ok']
             
             readme_content += f"""
 ## 统计信息
@@ -742,12 +3435,26 @@ class WeirdhostAuto:
 - 总服务器数: {total_servers}
 - 成功续期: {successful_renews}/{total_servers}
 - 成功启动: {successful_starts}/{total_servers}
+- 未到续期时间跳过: {summary['skipped']}
+- 启动未确认（按失败处理）: {summary['start_skipped']}
+- 超出时间预算未处理: {summary['dropped']}
+- CF熔断: {'本次运行被CF拦截 (blocked)' if self.breaker.blocked else '未拦截'}，触发 {self.breaker.trips} 次
+- 从中断运行恢复: {self.resumed}
+- 自适应超时: 调整 {len(self.timeouts.adjusted)} 项
+- 延后重试: {self.retry.total_retries()} 次，恢复 {self.retry.recovered} 个服务器
+- 内存峰值: 进程树 {self.memory['tree_peak'] / 1024 / 1024:.0f} MB，回收页面 {self.memory['pages_recycled']} 次 / 上下文 {self.memory['contexts_recycled']} 次
+- 就绪等待节省: {self.readiness.total_saved():.1f} 秒
+- 页面加载: {navigations} 次导航（{self.load_profile}），拦截 {blocked} 个请求，{navigation_saved}
 - 运行时间: {timestamp}
 
+## 阶段耗时
+
+{phase_table}
+
 ## CF五秒盾处理说明
 
 1. 脚本已增加CF挑战检测功能
-2. 检测到CF挑战时会自动等待10-15秒
+2. 检测到CF挑战时等待挑战页面消失（最长20秒），无挑战时不额外等待
 3. 如果按钮被CF屏蔽，会尝试刷新页面重试
 4. 增加了人类行为模拟（延迟、悬停）
 
@@ -765,16 +3472,99 @@ class WeirdhostAuto:
             self.log(f"写入README文件失败: {e}", "ERROR")
 
 
+def load_accounts():
+    """读取多账户配置
+    
+    WEIRDHOST_ACCOUNTS 为 JSON 数组（或由 WEIRDHOST_ACCOUNTS_FILE 指定的 JSON 文件），每项形如
+    {"name": "main", "remember_web_cookie": "...", "email": "...", "password": "...",
+     "servers": ["https://hub.weirdhost.xyz/server/abc12345", ...]}
+    servers 也可以是逗号分隔的字符串。未配置时返回空列表，沿用单账户环境变量。
+    """
+    raw = os.getenv('WEIRDHOST_ACCOUNTS', '')
+    path = os.getenv('WEIRDHOST_ACCOUNTS_FILE', '')
+    if not raw.strip() and path:
+        with open(path, 'r', encoding='utf-8') as f:
+            raw = f.read()
+    if not raw.strip():
+        return []
+    
+    entries = json.loads(raw)
+    if not isinstance(entries, list):
+        raise ValueError("多账户配置必须是 JSON 数组")
+    
+    accounts = []
+    names = set()
+    for index, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"第 {index} 个账户配置必须是 JSON 对象")
+        servers = entry.get('servers', [])
+        if isinstance(servers, str):
+            servers = servers.split(',')
+        if not isinstance(servers, list) or not all(isinstance(url, str) for url in servers):
+            raise ValueError(f"第 {index} 个账户的 servers 必须是字符串数组或逗号分隔的字符串")
+        # 账户名用作缓存子目录，只保留安全字符并去重
+        name = re.sub(r'[^\w.-]', '_', str(entry.get('name') or f"account{index}"))
+        if name in names:
+            name = f"{name}_{index}"
+        names.add(name)
+        accounts.append(dict(entry, name=name, servers=[url.strip() for url in servers if url.strip()]))
+    return accounts
+
+
+def run_account(account):
+    """进程池任务：处理单个账户并返回报告"""
+    auto = WeirdhostAuto(account)
+    try:
+        results = auto.run()
+    except Exception as e:
+        auto.log(f"账户运行出错: {e}", "ERROR")
+        return auto.failed_account_report(account)
+    return auto.account_report(results)
+
+
+def run_account_daemon(account):
+    """多账户守护模式：单个账户的常驻进程"""
+    WeirdhostAuto(account).run_daemon()
+
+
+def run_daemons(accounts):
+    """多账户守护模式：每个账户一个常驻进程，直到全部退出"""
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(target=run_account_daemon, args=(account,), name=f"weirdhost-{account['name']}")
+        for account in accounts
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
 def main():
-    """主函数"""
+    """主函数
+    
+    python main.py 运行一次；python main.py daemon 以守护模式常驻运行（适用于自托管 runner 或 VPS）。
+    """
+    daemon = len(sys.argv) > 1 and sys.argv[1] == 'daemon'
     print("🚀 Weirdhost 自动续期和启动脚本启动 (CF五秒盾修复版)")
     print("=" * 50)
     
     # 创建自动操作器
     auto = WeirdhostAuto()
     
-    # 检查环境变量
-    if not auto.has_cookie_auth() and not auto.has_email_auth():
+    # 多账户配置
+    try:
+        accounts = load_accounts()
+    except (OSError, ValueError) as e:
+        print(f"❌ 错误：多账户配置无效: {e}")
+        sys.exit(1)
+    
+    # 检查环境变量（多账户模式下认证信息在各账户配置中）
+    if not accounts and not auto.has_cookie_auth() and not auto.has_email_auth():
         print("❌ 错误：未设置认证信息！")
         print("\n请在 GitHub Secrets 中设置以下任一组合：")
         print("\n方案1 - Cookie 认证：")
@@ -783,10 +3573,11 @@ def main():
         print("WEIRDHOST_EMAIL: 你的邮箱")
         print("WEIRDHOST_PASSWORD: 你的密码")
         print("\n推荐使用 Cookie 认证，更稳定可靠")
+        print("\n多账户请设置 WEIRDHOST_ACCOUNTS（JSON 数组，每个账户包含认证信息和 servers 列表）")
         sys.exit(1)
     
     # 检查服务器URL列表
-    if not auto.server_list:
+    if not accounts and not auto.server_list:
         print("❌ 错误：未设置服务器URL列表！")
         print("\n请在 GitHub Secrets 中设置：")
         print("WEIRDHOST_SERVER_URLS: https://hub.weirdhost.xyz/server/服务器ID1,https://hub.weirdhost.xyz/server/服务器ID2")
@@ -794,12 +3585,25 @@ def main():
         sys.exit(1)
     
     print("🔧 配置检查通过")
-    print(f"📋 服务器数量: {len(auto.server_list)}")
+    if accounts:
+        print(f"👥 账户数量: {len(accounts)}")
+        print(f"📋 服务器数量: {sum(len(account['servers']) for account in accounts)}")
+    else:
+        print(f"📋 服务器数量: {len(auto.server_list)}")
+    print(f"🔀 并发数量: {auto.concurrency}")
     print("⚠️  注意：此版本已针对CF五秒盾进行优化")
     print("=" * 50)
     
-    # 执行自动任务
-    results = auto.run()
+    # 守护模式：常驻运行，直到收到退出信号
+    if daemon:
+        if accounts:
+            run_daemons(accounts)
+        else:
+            auto.run_daemon()
+        sys.exit(0)
+    
+    # 执行自动任务（多账户时每个账户一个进程）
+    results = auto.run_accounts(accounts) if accounts else auto.run()
     
     # 写入README文件
     auto.write_readme_file(results)
@@ -808,27 +3612,33 @@ def main():
     print("📊 运行结果汇总:")
     
     # 显示详细结果
-    for server_id, status in auto.server_results.items():
-        print(f"\n服务器: {server_id}")
-        print(f"  续期: {status['renew_status']}")
-        print(f"  启动: {status['start_status']}")
+    for server_id, result in auto.server_results.items():
+        print(f"\n服务器: {server_id}" + (f" (账户 {result.account})" if result.account else ""))
+        print(f"  续期: {result.renew_status}")
+        print(f"  启动: {result.start_status}")
+        print(f"  方式: {result.via or 'N/A'}, 耗时: {result.duration:.1f}s")
     
     # 统计结果
-    total = len(auto.server_list)
-    renew_success = sum(1 for s in auto.server_results.values() 
-                       if s['renew_status'] in ['renew_success', 'already_renewed'])
-    start_success = sum(1 for s in auto.server_results.values() 
-                       if s['start_status'] in ['start_success', 'already_started'])
+    summary = auto.result_summary()
+    total = summary['total']
     
     print("\n" + "=" * 50)
     print(f"📈 统计信息:")
     print(f"  总服务器数: {total}")
-    print(f"  续期成功率: {renew_success}/{total}")
-    print(f"  启动成功率: {start_success}/{total}")
+    print(f"  续期成功率: {summary['renew_ok']}/{total}")
+    print(f"  启动成功率: {summary['start_ok']}/{total}")
+    print(f"  未到续期时间跳过: {summary['skipped']}")
+    print(f"  启动未确认: {summary['start_skipped']}")
+    print(f"  超出时间预算未处理: {summary['dropped']}")
+    print(f"  延后重试: {auto.retry.total_retries()} 次，恢复 {auto.retry.recovered} 个服务器")
     print("=" * 50)
     
+    if auto.breaker.blocked:
+        print("⛔ 本次运行被CF拦截 (blocked)，剩余服务器未处理")
+        sys.exit(1)
+    
     # 检查是否有完全失败的情况
-    if any("login_failed" in result or "error:" in result for result in results):
+    if summary['start_skipped'] or summary['dropped'] or any("login_failed" in result or "error:" in result for result in results):
         print("❌ 任务有失败的情况！")
         sys.exit(1)
     else:
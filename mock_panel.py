@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Weirdhost 面板本地模拟服务器 - 用于基准测试和回归测试
+
+模拟登录页、服务器控制台页、"시간추가"/"Start" 按钮、成功/错误提示框、可选的
+CF 五秒盾页面，以及脚本用到的 /api/client 接口。延迟、失败率和 CF 挑战比例可配置。
+
+用法: python mock_panel.py --port 8765 --servers 10 --latency-ms 50 --failure-rate 0.05 --cf-rate 0.2
+"""
+
+import re
+import sys
+import json
+import time
+import random
+import secrets
+import argparse
+import threading
+from datetime import datetime, timezone, timedelta
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# 与 main.py 中的 WeirdhostAuto.REMEMBER_COOKIE_NAME 保持一致
+REMEMBER_COOKIE_NAME = 'remember_web_59ba36addc2b2f9401580f014c7f58ea4e30989d'
+
+# 面板显示时间的时区（韩国时间 UTC+9）
+PANEL_TZ = timezone(timedelta(hours=9))
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Login - Weirdhost</title></head>
+<body><main class="container">
+<form method="post" action="/auth/login">
+  <input name="username" type="text">
+  <input name="password" type="password">
+  <button type="submit">Login</button>
+</form>
+</main></body></html>"""
+
+DASHBOARD_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Dashboard - Weirdhost</title></head>
+<body><main class="container">{links}</main></body></html>"""
+
+CONSOLE_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{server_id} - Weirdhost</title>
+<link rel="preload" href="/static/panel.woff2" as="font" crossorigin>
+</head>
+<body>
+<main class="container">
+  <img src="/static/banner.png"><img src="/static/avatar.png"><img src="/static/egg.png">
+  <div class="server-details">
+    <h1>{server_id}</h1>
+    <p>유통기한: <span id="expiry">{expiry}</span></p>
+    <button id="renew">시간추가</button>
+    <button id="start" {start_disabled}>Start</button>
+  </div>
+</main>
+<script>
+const serverId = {server_id_json};
+const xsrf = () => decodeURIComponent((document.cookie.match(/(?:^|; )XSRF-TOKEN=([^;]*)/) || [])[1] || '');
+const toast = (text) => {{
+  const el = document.createElement('div');
+  el.className = 'toast';
+  el.setAttribute('role', 'alert');
+  el.textContent = text;
+  document.body.appendChild(el);
+}};
+const post = (path, body) => fetch(path, {{
+  method: 'POST',
+  headers: {{'Accept': 'application/json', 'Content-Type': 'application/json', 'X-XSRF-TOKEN': xsrf()}},
+  body: body ? JSON.stringify(body) : null,
+}});
+const detail = async (response) => {{
+  try {{ return ((await response.json()).errors || []).map(e => e.detail).join(' '); }} catch (e) {{ return ''; }}
+}};
+document.getElementById('renew').addEventListener('click', async () => {{
+  const response = await post(`/api/client/notfreeservers/${{serverId}}/renew`);
+  if (response.ok) {{
+    const data = await response.json();
+    document.getElementById('expiry').textContent = data.attributes.expiry;
+    toast('시간이 추가되었습니다 (success)');
+  }} else {{
+    toast(await detail(response) || 'error');
+  }}
+}});
+document.getElementById('start').addEventListener('click', async () => {{
+  const button = document.getElementById('start');
+  const response = await post(`/api/client/servers/${{serverId}}/power`, {{signal: 'start'}});
+  if (response.ok) {{
+    button.disabled = true;
+    toast('Server started');
+  }} else {{
+    toast(await detail(response) || 'error');
+  }}
+}});
+</script>
+</body></html>"""
+
+CF_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Just a moment...</title></head>
+<body><div id="challenge-running">Checking your browser before accessing the site.</div>
+<script>
+setTimeout(() => {{ document.cookie = 'cf_clearance=mock; path=/'; location.reload(); }}, {delay_ms});
+</script>
+</body></html>"""
+
+
+class MockPanel:
+    """模拟面板：保存服务器状态和请求统计，在后台线程中提供 HTTP 服务"""
+    
+    def __init__(self, server_count=1, latency_ms=0, failure_rate=0.0, cf_rate=0.0,
+                 cf_delay_ms=1500, email='bench@example.com', password='bench',
+                 renew_cooldown=3600, seed=None):
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.cf_rate = cf_rate
+        self.cf_delay_ms = cf_delay_ms
+        self.email = email
+        self.password = password
+        self.renew_cooldown = renew_cooldown
+        self.random = random.Random(seed)
+        
+        self.lock = threading.Lock()
+        now = datetime.now(PANEL_TZ)
+        # 服务器ID -> 状态
+        self.servers = {
+            f"mock{index:04d}": {
+                'state': 'offline',
+                'renewed_at': 0.0,
+                'expiry': now + timedelta(hours=12),
+            }
+            for index in range(1, server_count + 1)
+        }
+        self.sessions = set()
+        # 路由 -> 请求次数
+        self.stats = {}
+        self.httpd = None
+        self.thread = None
+    
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://localhost:{port}"
+    
+    def server_urls(self):
+        return [f"{self.base_url}/server/{server_id}" for server_id in self.servers]
+    
+    def start(self, port=0):
+        """在后台线程中启动服务，port 为 0 时自动分配端口"""
+        handler = type('Handler', (MockPanelHandler,), {'panel': self})
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='mock-panel', daemon=True)
+        self.thread.start()
+        return self.base_url
+    
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+    
+    def count(self, route):
+        with self.lock:
+            self.stats[route] = self.stats.get(route, 0) + 1
+    
+    def delay(self):
+        """模拟网络和服务端延迟：latency_ms 的 0.5~1.5 倍"""
+        if self.latency_ms:
+            time.sleep(self.latency_ms * self.random.uniform(0.5, 1.5) / 1000)
+    
+    def roll(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+    
+    def renew(self, server_id):
+        """续期：冷却期内重复续期返回 400"""
+        with self.lock:
+            server = self.servers[server_id]
+            now = time.time()
+            if now - server['renewed_at'] < self.renew_cooldown:
+                return 400, {'errors': [{'code': 'BadRequest', 'detail': 'You can only renew once every 24 hours'}]}
+            server['renewed_at'] = now
+            server['expiry'] += timedelta(hours=24)
+            return 200, {'object': 'server', 'attributes': {
+                'identifier': server_id,
+                'expiry': server['expiry'].strftime('%Y-%m-%d %H:%M:%S'),
+            }}
+    
+    def power(self, server_id, signal):
+        with self.lock:
+            server = self.servers[server_id]
+            if signal == 'start':
+                server['state'] = 'running'
+            elif signal in ('stop', 'kill'):
+                server['state'] = 'offline'
+
+
+class MockPanelHandler(BaseHTTPRequestHandler):
+    """模拟面板的请求处理，panel 由 MockPanel.start 注入"""
+    
+    protocol_version = 'HTTP/1.1'
+    # 响应头和响应体分两次写出，关闭 Nagle 算法避免 keep-alive 连接上的延迟确认等待
+    disable_nagle_algorithm = True
+    panel = None
+    
+    SERVER_PATH = re.compile(r'^/server/(?P<id>[\w-]+)$')
+    RESOURCES_PATH = re.compile(r'^/api/client/servers/(?P<id>[\w-]+)/resources$')
+    POWER_PATH = re.compile(r'^/api/client/servers/(?P<id>[\w-]+)/power$')
+    RENEW_PATH = re.compile(r'^/api/client/notfreeservers/(?P<id>[\w-]+)/renew$')
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def cookies(self):
+        parsed = SimpleCookie()
+        try:
+            parsed.load(self.headers.get('Cookie', ''))
+        except Exception:
+            pass
+        return {name: morsel.value for name, morsel in parsed.items()}
+    
+    def authenticated(self, cookies):
+        return REMEMBER_COOKIE_NAME in cookies or cookies.get('mock_session') in self.panel.sessions
+    
+    def send(self, status, body=b'', content_type='text/html; charset=utf-8', headers=None):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if 'XSRF-TOKEN' not in self.cookies():
+            self.send_header('Set-Cookie', f"XSRF-TOKEN={secrets.token_hex(16)}; Path=/")
+        for name, value in (headers or []):
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+    
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False) if data is not None else ''
+        self.send(status, body, 'application/json')
+    
+    def redirect(self, location, headers=None):
+        self.send(302, '', headers=[('Location', location)] + list(headers or []))
+    
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+    
+    def cf_challenged(self, path, cookies):
+        """未通过 CF 挑战的页面/API 请求按 cf_rate 比例返回挑战"""
+        if path.startswith('/static/') or 'cf_clearance' in cookies:
+            return False
+        return self.panel.roll(self.panel.cf_rate)
+    
+    def do_GET(self):
+        self.panel.delay()
+        path = urlparse(self.path).path
+        cookies = self.cookies()
+        
+        if self.cf_challenged(path, cookies):
+            self.panel.count('cf_challenge')
+            if path.startswith('/api/'):
+                self.send(403, CF_PAGE.format(delay_ms=self.panel.cf_delay_ms), headers=[('cf-mitigated', 'challenge')])
+            else:
+                self.send(503, CF_PAGE.format(delay_ms=self.panel.cf_delay_ms))
+            return
+        
+        if path.startswith('/static/'):
+            self.panel.count('static')
+            content_type = 'font/woff2' if path.endswith('.woff2') else 'image/png'
+            self.send(200, b'\0' * 20480, content_type, headers=[('Cache-Control', 'no-store')])
+            return
+        
+        if path == '/auth/login':
+            self.panel.count('login_page')
+            self.send(200, LOGIN_PAGE)
+            return
+        
+        if not self.authenticated(cookies):
+            self.panel.count('unauthenticated')
+            if path.startswith('/api/'):
+                self.send_json(401, {'errors': [{'code': 'AuthenticationException', 'detail': 'Unauthenticated.'}]})
+            else:
+                self.redirect('/auth/login')
+            return
+        
+        if path == '/':
+            self.panel.count('dashboard')
+            links = ''.join(f'<a href="/server/{sid}">{sid}</a>' for sid in self.panel.servers)
+            self.send(200, DASHBOARD_PAGE.format(links=links))
+            return
+        
+        if path == '/api/client':
+            self.panel.count('api_client')
+            self.send_json(200, {'object': 'list', 'data': [
+                {'object': 'server', 'attributes': {'identifier': sid}} for sid in self.panel.servers
+            ]})
+            return
+        
+        match = self.SERVER_PATH.match(path)
+        if match and match['id'] in self.panel.servers:
+            self.panel.count('console_page')
+            server = self.panel.servers[match['id']]
+            self.send(200, CONSOLE_PAGE.format(
+                server_id=match['id'],
+                server_id_json=json.dumps(match['id']),
+                expiry=server['expiry'].strftime('%Y-%m-%d %H:%M:%S'),
+                start_disabled='disabled' if server['state'] == 'running' else '',
+            ))
+            return
+        
+        match = self.RESOURCES_PATH.match(path)
+        if match and match['id'] in self.panel.servers:
+            self.panel.count('api_resources')
+            self.send_json(200, {'object': 'stats', 'attributes': {
+                'current_state': self.panel.servers[match['id']]['state'],
+            }})
+            return
+        
+        self.panel.count('not_found')
+        self.send(404, 'Not Found')
+    
+    def do_POST(self):
+        self.panel.delay()
+        path = urlparse(self.path).path
+        cookies = self.cookies()
+        body = self.read_body()
+        
+        if path == '/auth/login':
+            self.panel.count('login_submit')
+            form = parse_qs(body.decode('utf-8'))
+            if form.get('username') == [self.panel.email] and form.get('password') == [self.panel.password]:
+                token = secrets.token_hex(16)
+                with self.panel.lock:
+                    self.panel.sessions.add(token)
+                self.redirect('/', headers=[('Set-Cookie', f"mock_session={token}; Path=/; HttpOnly")])
+            else:
+                self.redirect('/auth/login?error=1')
+            return
+        
+        if self.cf_challenged(path, cookies):
+            self.panel.count('cf_challenge')
+            self.send(403, CF_PAGE.format(delay_ms=self.panel.cf_delay_ms), headers=[('cf-mitigated', 'challenge')])
+            return
+        
+        if not self.authenticated(cookies):
+            self.panel.count('unauthenticated')
+            self.send_json(401, {'errors': [{'code': 'AuthenticationException', 'detail': 'Unauthenticated.'}]})
+            return
+        
+        for pattern, route in ((self.RENEW_PATH, 'api_renew'), (self.POWER_PATH, 'api_power')):
+            match = pattern.match(path)
+            if not match or match['id'] not in self.panel.servers:
+                continue
+            self.panel.count(route)
+            if self.panel.roll(self.panel.failure_rate):
+                self.panel.count(f"{route}_failed")
+                self.send_json(500, {'errors': [{'code': 'HttpException', 'detail': 'An unexpected error was encountered.'}]})
+                return
+            if route == 'api_renew':
+                status, data = self.panel.renew(match['id'])
+                self.send_json(status, data)
+            else:
+                try:
+                    signal = json.loads(body.decode('utf-8') or '{}').get('signal', '')
+                except ValueError:
+                    signal = ''
+                self.panel.power(match['id'], signal)
+                self.send(204, b'', 'application/json')
+            return
+        
+        self.panel.count('not_found')
+        self.send_json(404, {'errors': [{'code': 'NotFoundHttpException', 'detail': 'Not Found'}]})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Weirdhost 面板本地模拟服务器')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--servers', type=int, default=3, help='模拟的服务器数量')
+    parser.add_argument('--latency-ms', type=float, default=0, help='每个请求的平均延迟（毫秒）')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='续期/电源接口返回 500 的比例')
+    parser.add_argument('--cf-rate', type=float, default=0.0, help='未带 cf_clearance 的请求返回 CF 挑战的比例')
+    parser.add_argument('--cf-delay-ms', type=int, default=1500, help='CF 挑战页面自动通过前的等待（毫秒）')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    
+    panel = MockPanel(args.servers, args.latency_ms, args.failure_rate, args.cf_rate,
+                      args.cf_delay_ms, seed=args.seed)
+    panel.start(args.port)
+    print(f"模拟面板已启动: {panel.base_url}")
+    print(f"登录账号: {panel.email} / {panel.password}，或任意值的 {REMEMBER_COOKIE_NAME} cookie")
+    print(f"WEIRDHOST_SERVER_URLS={','.join(panel.server_urls())}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        panel.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())